@@ -0,0 +1,345 @@
+# Archivo: bitboard.py
+# Descripción: Generador de movimientos basado en bitboards (enteros de 64 bits).
+# Es una alternativa a los métodos get_valid_moves de pieces.py y produce exactamente
+# los mismos conjuntos de movimientos, incluida la habilidad 'omni_directional_pawn'.
+#
+# Convención: la casilla (fila, columna) corresponde al bit fila * 8 + columna.
+
+COLORS = ('white', 'black')
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+
+# Coordenadas (fila, columna) de cada índice de casilla, para no crear tuplas al decodificar.
+SQUARES = [(sq // 8, sq % 8) for sq in range(64)]
+
+
+def _offset_table(offsets):
+    """Precalcula, para cada casilla, el bitboard de destinos a un salto fijo."""
+    table = []
+    for sq in range(64):
+        row, col = SQUARES[sq]
+        bb = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << (r * 8 + c)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _offset_table([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = _offset_table([(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)])
+PAWN_ATTACKS = {
+    'white': _offset_table([(-1, -1), (-1, 1)]),
+    'black': _offset_table([(1, -1), (1, 1)]),
+}
+
+
+def _ray_table(dr, dc):
+    """Precalcula el rayo completo (sin bloqueos) desde cada casilla en una dirección."""
+    table = []
+    for sq in range(64):
+        row, col = SQUARES[sq]
+        bb = 0
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            bb |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        table.append(bb)
+    return table
+
+
+# Rayos "positivos" (hacia índices mayores) y "negativos" (hacia índices menores).
+# En un rayo positivo el primer bloqueo es el bit más bajo; en uno negativo, el más alto.
+ROOK_POSITIVE_RAYS = [_ray_table(0, 1), _ray_table(1, 0)]
+ROOK_NEGATIVE_RAYS = [_ray_table(0, -1), _ray_table(-1, 0)]
+BISHOP_POSITIVE_RAYS = [_ray_table(1, 1), _ray_table(1, -1)]
+BISHOP_NEGATIVE_RAYS = [_ray_table(-1, -1), _ray_table(-1, 1)]
+# Todas las casillas alineadas con cada casilla (rayos sin bloqueos), para descartar
+# deprisa las piezas deslizantes que no pueden atacarla
+ROOK_LINES = [sum(rays[sq] for rays in ROOK_POSITIVE_RAYS + ROOK_NEGATIVE_RAYS) for sq in range(64)]
+BISHOP_LINES = [sum(rays[sq] for rays in BISHOP_POSITIVE_RAYS + BISHOP_NEGATIVE_RAYS) for sq in range(64)]
+
+
+def _between_table():
+    """BETWEEN[a][b]: casillas estrictamente entre a y b si están alineadas (0 si no lo están)."""
+    table = [[0] * 64 for _ in range(64)]
+    directions = ((ROOK_POSITIVE_RAYS, ROOK_NEGATIVE_RAYS), (BISHOP_POSITIVE_RAYS, BISHOP_NEGATIVE_RAYS))
+    for positive_rays, negative_rays in directions:
+        for forward, backward in zip(positive_rays + negative_rays, negative_rays + positive_rays):
+            for a in range(64):
+                ray = forward[a]
+                while ray:
+                    lsb = ray & -ray
+                    b = lsb.bit_length() - 1
+                    table[a][b] = forward[a] & backward[b]
+                    ray ^= lsb
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def _slider_attacks(sq, occupied, positive_rays, negative_rays):
+    """Ataques de una pieza deslizante: cada rayo se corta en la primera pieza que encuentra."""
+    attacks = 0
+    for rays in positive_rays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative_rays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_POSITIVE_RAYS, ROOK_NEGATIVE_RAYS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_POSITIVE_RAYS, BISHOP_NEGATIVE_RAYS)
+
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+def squares_of(bb):
+    """Convierte un bitboard en la lista de casillas (fila, columna) que contiene."""
+    squares = []
+    while bb:
+        lsb = bb & -bb
+        squares.append(SQUARES[lsb.bit_length() - 1])
+        bb ^= lsb
+    return squares
+
+
+def from_squares(squares):
+    """Convierte una lista de casillas (fila, columna) en un bitboard."""
+    bb = 0
+    for row, col in squares:
+        bb |= 1 << (row * 8 + col)
+    return bb
+
+
+def piece_moves_bitboard(board, piece):
+    """Devuelve el bitboard de movimientos pseudo-legales de una pieza."""
+    sq = piece.row * 8 + piece.col
+    occupancy = board.occupancy
+    own = occupancy[piece.color]
+    name = piece.name
+
+    # Los peones van primero: son la mitad de las piezas de una partida
+    if name == 'pawn':
+        if piece.ability == 'omni_directional_pawn':
+            return KING_ATTACKS[sq] & ~own
+        occupied = occupancy['white'] | occupancy['black']
+        moves = PAWN_ATTACKS[piece.color][sq] & occupied & ~own
+        step = -8 if piece.color == 'white' else 8
+        target = sq + step
+        if 0 <= target < 64 and not (occupied >> target) & 1:
+            moves |= 1 << target
+            target += step
+            if not piece.has_moved and 0 <= target < 64 and not (occupied >> target) & 1:
+                moves |= 1 << target
+        return moves
+    if name == 'knight':
+        return KNIGHT_ATTACKS[sq] & ~own
+    if name == 'king':
+        return KING_ATTACKS[sq] & ~own
+
+    occupied = occupancy['white'] | occupancy['black']
+    if name == 'rook':
+        return rook_attacks(sq, occupied) & ~own
+    if name == 'bishop':
+        return bishop_attacks(sq, occupied) & ~own
+    return queen_attacks(sq, occupied) & ~own
+
+
+def get_piece_moves(board, piece):
+    """
+    Equivalente a piece.get_valid_moves(board.board) usando los bitboards del tablero.
+    Convertir a lista cuesta casi lo mismo que generar los movimientos; los bucles
+    calientes (perft, motor, caché de movimientos legales) recorren legal_move_bitboards.
+    """
+    return squares_of(piece_moves_bitboard(board, piece))
+
+
+def is_square_attacked(board, sq, by_color, occupied=None):
+    """
+    Indica si alguna pieza de 'by_color' ataca la casilla de índice sq. 'occupied' permite
+    mirar los rayos con otra ocupación (por ejemplo, sin el rey que se aparta de un jaque).
+    """
+    pieces = board.piece_bitboards[by_color]
+    if KNIGHT_ATTACKS[sq] & pieces['knight'] or KING_ATTACKS[sq] & pieces['king']:
+        return True
+
+    # Un peón ataca sq si está en una casilla desde la que un peón rival capturaría hacia él
+    defender = 'black' if by_color == 'white' else 'white'
+    if PAWN_ATTACKS[defender][sq] & pieces['pawn']:
+        return True
+    # Peones con 'omni_directional_pawn' atacan las 8 casillas vecinas
+    neighbours = KING_ATTACKS[sq] & pieces['pawn']
+    while neighbours:
+        lsb = neighbours & -neighbours
+        row, col = SQUARES[lsb.bit_length() - 1]
+        if board.board[row][col].ability == 'omni_directional_pawn':
+            return True
+        neighbours ^= lsb
+
+    if occupied is None:
+        occupied = board.occupancy['white'] | board.occupancy['black']
+    rooks = (pieces['rook'] | pieces['queen']) & ROOK_LINES[sq]
+    if rooks and rook_attacks(sq, occupied) & rooks:
+        return True
+    bishops = (pieces['bishop'] | pieces['queen']) & BISHOP_LINES[sq]
+    return bool(bishops and bishop_attacks(sq, occupied) & bishops)
+
+
+def _checkers(board, sq, by_color, occupied):
+    """Bitboard de las piezas de 'by_color' que atacan la casilla sq."""
+    pieces = board.piece_bitboards[by_color]
+    defender = 'black' if by_color == 'white' else 'white'
+    attackers = (KNIGHT_ATTACKS[sq] & pieces['knight'] | KING_ATTACKS[sq] & pieces['king']
+                 | PAWN_ATTACKS[defender][sq] & pieces['pawn'])
+    neighbours = KING_ATTACKS[sq] & pieces['pawn'] & ~attackers
+    while neighbours:
+        lsb = neighbours & -neighbours
+        row, col = SQUARES[lsb.bit_length() - 1]
+        if board.board[row][col].ability == 'omni_directional_pawn':
+            attackers |= lsb
+        neighbours ^= lsb
+    rooks = (pieces['rook'] | pieces['queen']) & ROOK_LINES[sq]
+    if rooks:
+        attackers |= rook_attacks(sq, occupied) & rooks
+    bishops = (pieces['bishop'] | pieces['queen']) & BISHOP_LINES[sq]
+    if bishops:
+        attackers |= bishop_attacks(sq, occupied) & bishops
+    return attackers
+
+
+def legal_move_bitboards(board, color, targets=-1):
+    """
+    Movimientos legales de las piezas de 'color' hacia las casillas de 'targets' (por ejemplo,
+    las piezas rivales para generar solo capturas) como [(pieza, bitboard)], solo las piezas que
+    tienen alguno. No se hace ni deshace ningún movimiento: el jaque y las clavadas se calculan
+    una vez por posición.
+      - Con un jaque, las piezas solo pueden capturar a la pieza que da jaque o interponerse
+        (BETWEEN); con dos, solo mueve el rey.
+      - Una pieza clavada contra su rey solo se mueve entre el rey y la pieza que la clava.
+      - El rey no puede ir a una casilla atacada, mirando los rayos sin él (no se tapa a sí mismo).
+    Equivale a filtrar piece_moves_bitboard con GameLogic.leaves_king_safe: en esta variante no
+    hay enroque, captura al paso ni coronación, y los peones omnidireccionales atacan como reyes.
+    """
+    grid = board.board
+    occupancy = board.occupancy
+    own = occupancy[color]
+    enemy_color = 'black' if color == 'white' else 'white'
+    occupied = own | occupancy[enemy_color]
+    result = []
+    king = board.kings.get(color)
+    if king is None:
+        # Sin rey no hay jaque: valen todos los movimientos pseudo-legales
+        pieces = own
+        while pieces:
+            lsb = pieces & -pieces
+            pieces ^= lsb
+            row, col = SQUARES[lsb.bit_length() - 1]
+            piece = grid[row][col]
+            moves = piece_moves_bitboard(board, piece) & targets
+            if moves:
+                result.append((piece, moves))
+        return result
+
+    king_sq = king.row * 8 + king.col
+    king_bit = 1 << king_sq
+    between = BETWEEN[king_sq]
+    checkers = _checkers(board, king_sq, enemy_color, occupied)
+    if not checkers:
+        check_mask = targets
+    elif checkers & (checkers - 1):
+        check_mask = 0 # Jaque doble
+    else:
+        check_mask = (checkers | between[checkers.bit_length() - 1]) & targets
+
+    # Clavadas: una sola pieza propia entre el rey y una pieza deslizante rival alineada con él
+    # (ROOK_LINES y BISHOP_LINES no se solapan, así que cada una clava en su propia dirección)
+    pins = {}
+    enemy = board.piece_bitboards[enemy_color]
+    pinners = ((enemy['rook'] | enemy['queen']) & ROOK_LINES[king_sq]
+               | (enemy['bishop'] | enemy['queen']) & BISHOP_LINES[king_sq])
+    while pinners:
+        lsb = pinners & -pinners
+        pinners ^= lsb
+        pinner_sq = lsb.bit_length() - 1
+        blockers = between[pinner_sq] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pins[blockers] = between[pinner_sq] | lsb
+
+    moves = KING_ATTACKS[king_sq] & ~own & targets
+    candidates = moves
+    without_king = occupied ^ king_bit
+    while candidates:
+        lsb = candidates & -candidates
+        candidates ^= lsb
+        if is_square_attacked(board, lsb.bit_length() - 1, enemy_color, without_king):
+            moves ^= lsb
+    if moves:
+        result.append((king, moves))
+
+    if not check_mask:
+        return result
+    # Un bucle por tipo de pieza con las tablas a mano, sin pasar por piece_moves_bitboard
+    mask = check_mask & ~own
+    own_pieces = board.piece_bitboards[color]
+    for name in ('knight', 'bishop', 'rook', 'queen'):
+        pieces = own_pieces[name]
+        while pieces:
+            lsb = pieces & -pieces
+            pieces ^= lsb
+            sq = lsb.bit_length() - 1
+            if name == 'knight':
+                moves = KNIGHT_ATTACKS[sq] & mask
+            elif name == 'bishop':
+                moves = bishop_attacks(sq, occupied) & mask
+            elif name == 'rook':
+                moves = rook_attacks(sq, occupied) & mask
+            else:
+                moves = queen_attacks(sq, occupied) & mask
+            if moves and lsb in pins:
+                moves &= pins[lsb]
+            if moves:
+                row, col = SQUARES[sq]
+                result.append((grid[row][col], moves))
+
+    pawn_attacks = PAWN_ATTACKS[color]
+    step = -8 if color == 'white' else 8
+    enemies = occupancy[enemy_color]
+    pieces = own_pieces['pawn']
+    while pieces:
+        lsb = pieces & -pieces
+        pieces ^= lsb
+        sq = lsb.bit_length() - 1
+        row, col = SQUARES[sq]
+        piece = grid[row][col]
+        if piece.ability == 'omni_directional_pawn':
+            moves = KING_ATTACKS[sq] & mask
+        else:
+            moves = pawn_attacks[sq] & enemies
+            target = sq + step
+            if 0 <= target < 64 and not (occupied >> target) & 1:
+                moves |= 1 << target
+                target += step
+                if not piece.has_moved and 0 <= target < 64 and not (occupied >> target) & 1:
+                    moves |= 1 << target
+            moves &= mask
+        if moves and lsb in pins:
+            moves &= pins[lsb]
+        if moves:
+            result.append((piece, moves))
+    return result
@@ -1,22 +1,60 @@
 # Archivo: board.py
 # Descripción: Contiene la clase Board, que representa el estado del tablero de ajedrez.
-import pygame as pg
 from config import ROWS, COLS
-from pieces import Pawn, Rook, Knight, Bishop, Queen, King
+from pieces import Pawn, Rook, Knight, Bishop, Queen, King, PIECE_CLASSES, MOVED_FLAG, ABILITY_MASK, ABILITY_CODES, ABILITIES_BY_CODE, piece_from_code
+from bitboard import COLORS, PIECE_NAMES
+import zobrist
 
 class Board:
     """
     Gestiona el estado interno del tablero, incluyendo la posición de las piezas.
+    El estado de las piezas se guarda también de forma compacta en 'squares' (un byte por
+    casilla, ver pieces.py); las instancias de Piece son la vista cómoda sobre esos datos.
     """
-    def __init__(self):
+    def __init__(self, squares=None):
         self.board = []
+        self.squares = bytearray(64)
+        # Bitboards (enteros de 64 bits) de ocupación por color y por tipo de pieza,
+        # mantenidos de forma incremental en make_move/unmake_move.
+        self.occupancy = {}
+        self.piece_bitboards = {}
+        # Rey de cada color (o None si fue capturado); su fila/columna viaja con la pieza.
+        self.kings = {}
+        # Contador de versión de la posición; lo usan las cachés de GameLogic para invalidarse.
+        self.version = 0
+        # Hash Zobrist de las piezas (tipo, color, casilla, has_moved y habilidad)
+        self.zobrist_hash = 0
+        if squares is not None:
+            self.load_squares(squares) # Posición dada en formato compacto
+            return
         self.create_board() # Primero crea la matriz vacía
         self.setup_pieces() # Luego, llena la matriz con piezas
+        self.refresh_indexes()
 
     def create_board(self):
         """Crea la estructura de datos del tablero (matriz 8x8)."""
         self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
 
+    def refresh_indexes(self):
+        """Recalcula los bytes de 'squares', los bitboards, los reyes y el hash recorriendo la matriz."""
+        self.squares = bytearray(64)
+        self.occupancy = {color: 0 for color in COLORS}
+        self.piece_bitboards = {color: {name: 0 for name in PIECE_NAMES} for color in COLORS}
+        self.kings = {color: None for color in COLORS}
+        self.zobrist_hash = 0
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece is not None:
+                    sq = row * 8 + col
+                    bit = 1 << sq
+                    self.squares[sq] = piece.encode()
+                    self.occupancy[piece.color] |= bit
+                    self.piece_bitboards[piece.color][piece.name] |= bit
+                    if piece.name == 'king':
+                        self.kings[piece.color] = piece
+                    self.zobrist_hash ^= zobrist.CODE_KEYS[sq][self.squares[sq]]
+
     def setup_pieces(self):
         """Coloca las piezas en sus posiciones iniciales."""
         # Piezas Negras (se asignan directamente a las filas)
@@ -27,33 +65,87 @@ class Board:
         self.board[6] = [Pawn(6, i, 'white') for i in range(COLS)] # type: ignore
         self.board[7] = [Rook(7, 0, 'white'), Knight(7, 1, 'white'), Bishop(7, 2, 'white'), Queen(7, 3, 'white'), King(7, 4, 'white'), Bishop(7, 5, 'white'), Knight(7, 6, 'white'), Rook(7, 7, 'white')] # type: ignore
 
-    def draw_pieces(self, screen):
-        """Dibuja todas las piezas en el tablero."""
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece is not None:
-                    piece.draw(screen)
-
     def move_piece(self, piece, row, col, keep_ability=False):
         """Mueve una pieza a una nueva posición en el tablero."""
-        self.board[piece.row][piece.col] = None
+        self.make_move(piece, row, col, keep_ability)
+        self.version += 1
+
+    def set_ability(self, piece, ability):
+        """Cambia la habilidad de una pieza manteniendo al día el hash y la versión de la posición."""
+        sq = piece.row * 8 + piece.col
+        code = self.squares[sq]
+        new_code = (code & ~ABILITY_MASK) | ABILITY_CODES[ability]
+        self.squares[sq] = new_code
+        self.zobrist_hash ^= zobrist.CODE_KEYS[sq][code] ^ zobrist.CODE_KEYS[sq][new_code]
+        piece.ability = ability
+        self.version += 1
+
+    def make_move(self, piece, row, col, keep_ability=False):
+        """
+        Aplica un movimiento de forma reversible y devuelve el registro para deshacerlo.
+        El registro guarda la pieza capturada y los bytes previos de origen y destino,
+        que contienen el has_moved y la habilidad anteriores de la pieza.
+        Sirve tanto para los movimientos reales como para simular jugadas.
+        """
+        from_row, from_col = piece.row, piece.col
+        from_sq = from_row * 8 + from_col
+        to_sq = row * 8 + col
+        squares = self.squares
+        from_code = squares[from_sq]
+        to_code = squares[to_sq]
+        captured = self.board[row][col]
+        undo = (piece, from_row, from_col, captured, from_code, to_code, self.zobrist_hash)
+        self._toggle_bitboards(piece, from_row, from_col, row, col, captured)
+        if captured is not None and captured.name == 'king':
+            self.kings[captured.color] = None
+
+        # Marcar que la pieza ya se ha movido; al moverse pierde su habilidad especial
+        new_code = from_code | MOVED_FLAG
+        if not keep_ability:
+            new_code &= ~ABILITY_MASK
+            piece.ability = None
+        piece.has_moved = True
+        squares[from_sq] = 0
+        squares[to_sq] = new_code
+        keys = zobrist.CODE_KEYS
+        self.zobrist_hash ^= keys[from_sq][from_code] ^ keys[to_sq][to_code] ^ keys[to_sq][new_code]
+
+        self.board[from_row][from_col] = None
         self.board[row][col] = piece
         piece.row = row
         piece.col = col
-        if not keep_ability:
-            # Al moverse, la pieza pierde su habilidad especial
-            piece.ability = None
-        piece.has_moved = True # Marcar que la pieza ya se ha movido
-        piece.calculate_pixel_pos()
+        return undo
+
+    def unmake_move(self, undo):
+        """Deshace un movimiento hecho con make_move a partir de su registro."""
+        piece, from_row, from_col, captured, from_code, to_code, position_hash = undo
+        row, col = piece.row, piece.col
+        self._toggle_bitboards(piece, from_row, from_col, row, col, captured)
+        if captured is not None and captured.name == 'king':
+            self.kings[captured.color] = captured
+        self.squares[from_row * 8 + from_col] = from_code
+        self.squares[row * 8 + col] = to_code
+        self.board[row][col] = captured
+        self.board[from_row][from_col] = piece
+        piece.row = from_row
+        piece.col = from_col
+        piece.has_moved = bool(from_code & MOVED_FLAG)
+        piece.ability = ABILITIES_BY_CODE[from_code & ABILITY_MASK]
+        self.zobrist_hash = position_hash
+
+    def _toggle_bitboards(self, piece, from_row, from_col, row, col, captured):
+        """Actualiza los bitboards con XOR; aplicarlo dos veces deshace el movimiento."""
+        to_bit = 1 << (row * 8 + col)
+        move_bits = (1 << (from_row * 8 + from_col)) | to_bit
+        self.occupancy[piece.color] ^= move_bits
+        self.piece_bitboards[piece.color][piece.name] ^= move_bits
+        if captured is not None:
+            self.occupancy[captured.color] ^= to_bit
+            self.piece_bitboards[captured.color][captured.name] ^= to_bit
 
     def load_from_state(self, board_state):
         """Limpia el tablero y lo carga desde una lista de diccionarios."""
         self.create_board() # Limpia el tablero
-        piece_class_map = {
-            'pawn': Pawn, 'rook': Rook, 'knight': Knight,
-            'bishop': Bishop, 'queen': Queen, 'king': King
-        }
 
         for r, row_data in enumerate(board_state):
             for c, piece_data in enumerate(row_data):
@@ -62,8 +154,47 @@ class Board:
                     color = piece_data['color']
                     
                     # Crear la instancia de la pieza y colocarla en el tablero
-                    piece_class = piece_class_map[piece_type]
+                    piece_class = PIECE_CLASSES[piece_type]
                     new_piece = piece_class(r, c, color)
                     new_piece.ability = piece_data['ability']
                     new_piece.has_moved = piece_data['has_moved']
-                    self.board[r][c] = new_piece
\ No newline at end of file
+                    self.board[r][c] = new_piece
+        self.refresh_indexes()
+        self.version += 1
+
+    def load_squares(self, squares):
+        """
+        Limpia el tablero y lo carga desde los 64 bytes de una posición compacta. Las piezas,
+        los bitboards, los reyes y el hash se reconstruyen en una sola pasada por las casillas.
+        """
+        self.squares = bytearray(squares)
+        board = [[None] * COLS for _ in range(ROWS)]
+        occupancy = {color: 0 for color in COLORS}
+        piece_bitboards = {color: {name: 0 for name in PIECE_NAMES} for color in COLORS}
+        kings = {color: None for color in COLORS}
+        zobrist_hash = 0
+        keys = zobrist.CODE_KEYS
+        for sq, code in enumerate(self.squares):
+            if code:
+                row, col = sq >> 3, sq & 7
+                piece = board[row][col] = piece_from_code(code, row, col)
+                bit = 1 << sq
+                occupancy[piece.color] |= bit
+                piece_bitboards[piece.color][piece.name] |= bit
+                if piece.name == 'king':
+                    kings[piece.color] = piece
+                zobrist_hash ^= keys[sq][code]
+        self.board = board
+        self.occupancy = occupancy
+        self.piece_bitboards = piece_bitboards
+        self.kings = kings
+        self.zobrist_hash = zobrist_hash
+        self.version += 1
+
+    def snapshot(self):
+        """Copia inmutable de la posición de las piezas (64 bytes)."""
+        return bytes(self.squares)
+
+    def clone(self):
+        """Tablero independiente con la misma posición, creado a partir de una sola copia del búfer."""
+        return Board(self.squares)
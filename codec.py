@@ -0,0 +1,98 @@
+# Archivo: codec.py
+# Descripción: Codificación binaria compacta y versionada de una posición, para la base de
+# datos, los índices de posiciones y el envío por red. Es la idea de FEN (piezas, turno y
+# estado extra) con los bits de has_moved y de habilidad de ChessMagic.
+#
+# Formato (versión 1):
+#   byte 0      versión del formato (FORMAT_VERSION)
+#   byte 1      bit 0: juegan las negras; bit 7: hay una torre a mitad de su doble paso,
+#               y entonces los bits 1-6 son su casilla (fila * 8 + columna)
+#   bytes 2-9   ocupación: entero de 64 bits (little-endian), bit sq = casilla sq ocupada
+#   resto       un byte por pieza, en orden de casilla: el mismo byte de Board.squares
+#               (tipo, color, has_moved y habilidad, ver pieces.py)
+#
+# La posición inicial ocupa 2 + 8 + 32 = 42 bytes, y cada captura le quita uno.
+#
+# El estado del generador aleatorio de las habilidades (random.getstate()) se guarda aparte con
+# encode_rng_state: versión, indicador de gauss_next, los 625 enteros de 32 bits de Mersenne
+# Twister y, si lo hay, gauss_next como double (unos 2.5 KB).
+import struct
+
+from pieces import TYPE_CODES, BLACK_FLAG, MOVED_FLAG, ABILITY_CODES
+
+FORMAT_VERSION = 1
+HEADER_SIZE = 10
+BLACK_TO_MOVE = 0x01
+DOUBLE_STEP_FLAG = 0x80
+RNG_FORMAT_VERSION = 1
+# Tabla de bytes.translate: casilla vacía -> '0', ocupada -> '1'
+_OCCUPANCY_DIGITS = bytes([0x30] + [0x31] * 255)
+
+
+def encode_position(squares, turn='white', double_step_square=None):
+    """
+    Codifica los 64 bytes de 'squares' (Board.squares), el turno y la casilla de la torre
+    a mitad de su doble paso (o None) en el formato compacto.
+    """
+    flags = BLACK_TO_MOVE if turn == 'black' else 0
+    if double_step_square is not None:
+        flags |= DOUBLE_STEP_FLAG | (double_step_square << 1)
+    # Ocupación en binario: casilla 0 en el bit menos significativo
+    occupied = int(squares.translate(_OCCUPANCY_DIGITS)[::-1], 2)
+    # bytes.replace quita las casillas vacías de una vez: quedan las piezas en orden de casilla
+    return bytes((FORMAT_VERSION, flags)) + occupied.to_bytes(8, 'little') + bytes(squares).replace(b'\x00', b'')
+
+
+def decode_position(data):
+    """Inverso de encode_position: devuelve (squares, turn, double_step_square)."""
+    if len(data) < HEADER_SIZE or data[0] != FORMAT_VERSION:
+        raise ValueError(f"Posición codificada no válida (versión {data[0] if data else None})")
+    flags = data[1]
+    digits = format(int.from_bytes(data[2:HEADER_SIZE], 'little'), '064b')[::-1].encode()
+    codes = iter(data[HEADER_SIZE:])
+    if len(data) - HEADER_SIZE != digits.count(0x31):
+        raise ValueError("Posición codificada no válida (número de piezas)")
+    squares = bytearray(next(codes) if digit == 0x31 else 0 for digit in digits)
+    turn = 'black' if flags & BLACK_TO_MOVE else 'white'
+    double_step_square = (flags >> 1) & 0x3F if flags & DOUBLE_STEP_FLAG else None
+    return squares, turn, double_step_square
+
+
+def encode_game(game_logic):
+    """Codifica la posición actual de una partida (tablero, turno y doble paso en curso)."""
+    rook = game_logic.double_step_rook_moved
+    return encode_position(game_logic.board.squares, game_logic.turn,
+                           None if rook is None else rook.row * 8 + rook.col)
+
+
+def squares_from_state(board_state):
+    """Convierte el formato JSON antiguo (matriz 8x8 de diccionarios) a los 64 bytes de squares."""
+    squares = bytearray(64)
+    for r, row_data in enumerate(board_state):
+        for c, piece_data in enumerate(row_data):
+            if piece_data:
+                squares[r * 8 + c] = (TYPE_CODES[piece_data['type']]
+                                      | (BLACK_FLAG if piece_data['color'] == 'black' else 0)
+                                      | (MOVED_FLAG if piece_data['has_moved'] else 0)
+                                      | ABILITY_CODES[piece_data['ability']])
+    return squares
+
+
+def encode_rng_state(state):
+    """Codifica el estado de un random.Random (lo que devuelve getstate()) en bytes."""
+    version, internal, gauss_next = state
+    data = struct.pack(f'<BBB{len(internal)}I', RNG_FORMAT_VERSION, version, gauss_next is not None, *internal)
+    if gauss_next is not None:
+        data += struct.pack('<d', gauss_next)
+    return data
+
+
+def decode_rng_state(data):
+    """Inverso de encode_rng_state: devuelve un estado para random.Random.setstate()."""
+    if not data or data[0] != RNG_FORMAT_VERSION:
+        raise ValueError(f"Estado del generador aleatorio no válido (versión {data[0] if data else None})")
+    version, has_gauss = data[1], data[2]
+    count = (len(data) - 3 - (8 if has_gauss else 0)) // 4
+    internal = struct.unpack_from(f'<{count}I', data, 3)
+    gauss_next = struct.unpack_from('<d', data, 3 + count * 4)[0] if has_gauss else None
+    return version, internal, gauss_next
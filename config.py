@@ -37,7 +37,25 @@ VIDEO_FRAMES_PATH = os.path.join(BASE_DIR, 'video UL', 'assets image UL found',
 
 # --- Juego ---
 FPS = 60
+# Con la pantalla quieta el bucle duerme hasta un evento o, como mucho, este tiempo (segundos)
+IDLE_FRAME_TIME = 0.5
+# Vídeo del menú: velocidad del clip original y fotogramas decodificados por adelantado
+# (cada fotograma escalado a la ventana ocupa unos 1.8 MB)
+MENU_VIDEO_FPS = 30
+MENU_VIDEO_BUFFER = 16
 GAME_TIME_SECONDS = 600 # 10 minutos por jugador
+# Generador de movimientos: 'pieces' (métodos de cada pieza) o 'bitboard' (bitboard.py)
+# Con 'bitboard' los movimientos legales salen de las máscaras de jaque y clavada, sin hacer y
+# deshacer cada jugada: perft a profundidad 4 pasa de 75.000-90.000 nodos/s a 620.000-1.000.000
+# (8-12 veces) y el motor de 30.000-40.000 a 85.000-115.000 nodos/s (2-3 veces; el resto del
+# tiempo es evaluación y ordenación). Generar la lista de una sola pieza cuesta lo mismo.
+MOVE_GENERATOR = 'bitboard'
+# Tiempo máximo (segundos) que piensa la computadora por jugada
+ENGINE_MOVE_TIME = 2.0
+# Diario de jugadas: cada cuántas jugadas se guarda una posición completa (punto de control)
+JOURNAL_CHECKPOINT_INTERVAL = 20
+# Segundos que se muestra el aviso 'Partida guardada' en la barra superior
+SAVE_STATUS_TIME = 2.0
 
 # --- Fuentes ---
 UI_FONT_SIZE = 24
@@ -55,6 +73,7 @@ ABILITY_COLORS = {
     'double_step_rook': (50, 205, 50, 120),   # Verde Lima semi-transparente
     'default': (255, 223, 0, 100)             # Amarillo dorado por defecto
 }
+CHECK_AURA_COLOR = (255, 0, 0, 120) # Rojo semi-transparente sobre el rey en jaque
 
 ABILITY_DESCRIPTIONS = {
     'omni_directional_pawn': "Peón Omnidireccional: Puede moverse y capturar una casilla en cualquiera de las 8 direcciones.",
@@ -1,87 +1,768 @@
 # Archivo: database.py
 # Descripción: Gestiona la interacción con la base de datos SQLite para
 # guardar y cargar el estado del juego.
+#
+# Cada hilo usa una única conexión que se abre la primera vez que se necesita y se
+# mantiene abierta (sqlite3 no permite compartir una conexión entre hilos). La base de
+# datos trabaja en modo WAL con synchronous=NORMAL: un guardado es una transacción corta
+# que no espera a que el disco confirme cada escritura.
+#
+# Las escrituras (guardados, diario de jugadas) no se hacen en el hilo del juego: se preparan
+# allí como datos inmutables (la posición ya codificada) y las ejecuta un hilo escritor, que
+# agrupa en una sola transacción todo lo que se haya acumulado mientras escribía. Cada
+# escritura es una unidad (una o varias sentencias) con su propio SAVEPOINT: se aplica entera
+# o no se aplica, sin arrastrar a las demás del lote. Las lecturas esperan antes a que se
+# hayan escrito las operaciones pendientes (desde el hilo del juego, como mucho
+# READ_FLUSH_TIMEOUT segundos).
 
+import argparse
+import atexit
+import os
+import queue
 import sqlite3
 import json
+import sys
+import threading
+import time
 
-DB_FILE = "chess_magic.db"
+import config
+import zobrist
+from codec import encode_game, decode_position, encode_position, squares_from_state, encode_rng_state, decode_rng_state
+from board import Board
+from game_logic import GameLogic
 
-def init_db():
-    """Inicializa la base de datos y crea las tablas si no existen."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # Tabla para almacenar partidas guardadas
-    cursor.execute("""
+DB_FILE = os.path.join(config.BASE_DIR, "chess_magic.db")
+
+# Versión del esquema (PRAGMA user_version). La 0 guardaba el tablero como JSON en 'board_state';
+# la 1 guarda la posición en el formato binario de codec.py en 'position'; la 2 añade el diario
+# de jugadas (games, moves y checkpoints); la 3 guarda en saved_games el estado completo de la
+# partida (modo, relojes, fin de partida y generador aleatorio de las habilidades); la 4 añade
+# el índice de posiciones de las partidas guardadas (position_index); la 5 enlaza cada partida
+# guardada con su partida del diario (journal_game) y cada partida del diario con aquella de
+# la que sigue (parent_id), para indexar todas las posiciones por las que pasó; la 6 guarda el
+# hash de la posición en cada jugada y punto de control del diario, para indexarlas sin reproducir.
+SCHEMA_VERSION = 6
+
+# Sentencias fijas: sqlite3 guarda la versión preparada de cada texto SQL y la reutiliza
+SCHEMA_STATEMENTS = (
+    """
     CREATE TABLE IF NOT EXISTS saved_games (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL UNIQUE,
         turn TEXT NOT NULL,
-        board_state TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        position BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        game_over INTEGER NOT NULL DEFAULT 0,
+        rng_state BLOB,
+        game_mode TEXT,
+        computer_color TEXT,
+        white_time REAL,
+        black_time REAL,
+        timer_winner TEXT,
+        ply INTEGER,
+        journal_game INTEGER
     )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-def save_game_state(game_logic, board, save_name="quicksave"):
-    """Guarda el estado actual del tablero y el turno en la base de datos."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # Serializar el tablero a un formato de texto (JSON es ideal)
-    board_state = []
-    for row in range(8):
-        row_state = []
-        for col in range(8):
-            piece = board.board[row][col]
-            if piece:
-                piece_data = {
-                    "type": piece.name, # Usamos 'name' que ya tienes ('pawn', 'rook', etc.)
-                    "color": piece.color,
-                    "ability": piece.ability,
-                    "has_moved": piece.has_moved
-                }
-                row_state.append(piece_data)
-            else:
-                row_state.append(None)
-        board_state.append(row_state)
-
-    board_state_json = json.dumps(board_state)
-    turn = game_logic.turn
-
-    # Usar INSERT OR REPLACE para sobrescribir una partida con el mismo nombre (ej. "quicksave")
-    cursor.execute("""
-    INSERT OR REPLACE INTO saved_games (name, turn, board_state)
-    VALUES (?, ?, ?)
-    """, (save_name, turn, board_state_json))
-
-    conn.commit()
-    conn.close()
-    print(f"Partida '{save_name}' guardada correctamente.")
-
-def load_game_state(game_logic, board, save_name="quicksave"):
-    """Carga un estado de juego desde la base de datos y lo aplica al juego."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT turn, board_state FROM saved_games WHERE name = ?", (save_name,))
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        turn, board_state_json = result
-        board_state = json.loads(board_state_json)
-
-        # Aplicar el estado cargado
-        game_logic.turn = turn
-        board.load_from_state(board_state)
-        game_logic.piece_with_ability = None # Resetear habilidad activa
-        game_logic.double_step_rook_moved = None
-        print(f"Partida '{save_name}' cargada correctamente.")
+    """,
+    # Índice de posiciones: hash Zobrist de 64 bits (con signo, como los enteros de SQLite) de cada
+    # posición por la que pasó una partida guardada, tras 'ply' jugadas. La clave primaria empieza
+    # por el hash, así que buscar una posición es una búsqueda en el árbol B, no un recorrido.
+    """
+    CREATE TABLE IF NOT EXISTS position_index (
+        hash INTEGER NOT NULL,
+        game_id INTEGER NOT NULL REFERENCES saved_games (id) ON DELETE CASCADE,
+        ply INTEGER NOT NULL,
+        PRIMARY KEY (hash, game_id, ply)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS position_index_game ON position_index (game_id)",
+    # Una fila por partida jugada; sus jugadas se van añadiendo a 'moves' según ocurren.
+    # 'parent_id' es la partida del diario de la que sigue (al cargar una partida guardada).
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        game_mode TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        parent_id INTEGER REFERENCES games (id)
+    )
+    """,
+    # Diario de solo añadir: la jugada número 'ply' de la partida. Casillas = fila * 8 + columna;
+    # 'ability' y 'ability_square' son la habilidad en juego en ese turno y la casilla de la pieza
+    # que la tenía; 'clock' es el tiempo que le quedaba al jugador (NULL sin cronómetro) y 'hash',
+    # el de la posición resultante (con la habilidad del turno siguiente) para el índice.
+    # Una fila sin casillas es un turno pasado sin mover.
+    """
+    CREATE TABLE IF NOT EXISTS moves (
+        game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+        ply INTEGER NOT NULL,
+        from_square INTEGER,
+        to_square INTEGER,
+        piece TEXT,
+        captured TEXT,
+        ability TEXT,
+        ability_square INTEGER,
+        double_step INTEGER NOT NULL DEFAULT 0,
+        clock REAL,
+        hash INTEGER,
+        PRIMARY KEY (game_id, ply)
+    ) WITHOUT ROWID
+    """,
+    # Posición completa tras 'ply' jugadas (incluida la habilidad del turno siguiente), desde la
+    # que se reproducen las jugadas posteriores
+    """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+        ply INTEGER NOT NULL,
+        position BLOB NOT NULL,
+        white_time REAL,
+        black_time REAL,
+        hash INTEGER,
+        PRIMARY KEY (game_id, ply)
+    ) WITHOUT ROWID
+    """,
+)
+# Columnas añadidas a tablas que ya existían en versiones anteriores del esquema
+ADDED_COLUMNS = (
+    ('saved_games', 'game_over', 'INTEGER NOT NULL DEFAULT 0'),
+    ('saved_games', 'rng_state', 'BLOB'),
+    ('saved_games', 'game_mode', 'TEXT'),
+    ('saved_games', 'computer_color', 'TEXT'),
+    ('saved_games', 'white_time', 'REAL'),
+    ('saved_games', 'black_time', 'REAL'),
+    ('saved_games', 'timer_winner', 'TEXT'),
+    ('saved_games', 'ply', 'INTEGER'),
+    ('saved_games', 'journal_game', 'INTEGER'),
+    ('games', 'parent_id', 'INTEGER REFERENCES games (id)'),
+    ('moves', 'hash', 'INTEGER'),
+    ('checkpoints', 'hash', 'INTEGER'),
+)
+# Campos de Game.snapshot() que se guardan tal cual, en columnas del mismo nombre
+SNAPSHOT_COLUMNS = ('game_over', 'game_mode', 'computer_color', 'white_time', 'black_time', 'timer_winner', 'ply',
+                    'journal_game')
+# Sobrescribir una partida con el mismo nombre conserva su id (al que apunta el índice de posiciones)
+SAVE_SQL = f"""
+    INSERT INTO saved_games (name, turn, position, rng_state, {', '.join(SNAPSHOT_COLUMNS)})
+    VALUES (?, ?, ?, ?{', ?' * len(SNAPSHOT_COLUMNS)})
+    ON CONFLICT (name) DO UPDATE SET turn = excluded.turn, position = excluded.position,
+        rng_state = excluded.rng_state, created_at = CURRENT_TIMESTAMP,
+        {', '.join(f'{column} = excluded.{column}' for column in SNAPSHOT_COLUMNS)}
+"""
+UNINDEX_SAVE_SQL = "DELETE FROM position_index WHERE game_id = ?"
+SAVE_ID_SQL = "SELECT id FROM saved_games WHERE name = ?"
+# Jugadas ya indexadas si la partida guardada con ese nombre era de la misma partida del diario
+SAVED_PLY_SQL = "SELECT ply FROM saved_games WHERE name = ? AND journal_game = ?"
+INDEX_SQL = "INSERT OR IGNORE INTO position_index (hash, game_id, ply) VALUES (?, ?, ?)"
+# Posiciones del diario que una partida guardada añade a las del guardado anterior
+INDEX_NEW_MOVES_SQL = """
+    INSERT OR IGNORE INTO position_index (hash, game_id, ply)
+    SELECT hash, ?, ply FROM moves WHERE game_id = ? AND ply > ? AND ply <= ? AND hash IS NOT NULL
+"""
+# Todas las posiciones del diario hasta 'ply' jugadas, siguiendo parent_id hacia atrás: cada
+# partida del diario empieza en su primer punto de control, y las jugadas anteriores están en
+# la partida de la que sigue
+INDEX_JOURNAL_SQL = """
+    WITH RECURSIVE chain (game_id, first_ply, last_ply) AS (
+        SELECT :journal_game, (SELECT MIN(ply) FROM checkpoints WHERE game_id = :journal_game), :ply
+        UNION ALL
+        SELECT parent.id, (SELECT MIN(ply) FROM checkpoints WHERE game_id = parent.id), chain.first_ply - 1
+        FROM chain JOIN games AS child ON child.id = chain.game_id JOIN games AS parent ON parent.id = child.parent_id
+        WHERE chain.first_ply > 0
+    )
+    INSERT OR IGNORE INTO position_index (hash, game_id, ply)
+    SELECT moves.hash, :save_id, moves.ply FROM chain JOIN moves ON moves.game_id = chain.game_id
+        AND moves.ply > chain.first_ply AND moves.ply <= chain.last_ply
+    WHERE moves.hash IS NOT NULL
+    UNION ALL
+    SELECT checkpoints.hash, :save_id, checkpoints.ply FROM chain JOIN checkpoints ON checkpoints.game_id = chain.game_id
+        AND checkpoints.ply = chain.first_ply
+    WHERE checkpoints.ply <= chain.last_ply AND checkpoints.hash IS NOT NULL
+"""
+LOOKUP_SQL = """
+    SELECT saved_games.id, saved_games.name, position_index.ply FROM position_index
+    JOIN saved_games ON saved_games.id = position_index.game_id
+    WHERE position_index.hash = ? ORDER BY saved_games.id
+"""
+REINDEX_SELECT_SQL = "SELECT id, position, ply, journal_game FROM saved_games WHERE id > ? ORDER BY id LIMIT ?"
+# Filas de saved_games que se leen (y se indexan con un executemany) en cada lote del re-indexado
+REINDEX_BATCH = 5000
+LOAD_SQL = f"SELECT position, rng_state, {', '.join(SNAPSHOT_COLUMNS)} FROM saved_games WHERE name = ?"
+MIGRATE_SELECT_SQL = "SELECT id, name, turn, board_state, created_at FROM saved_games_json"
+MIGRATE_INSERT_SQL = "INSERT INTO saved_games (id, name, turn, position, created_at) VALUES (?, ?, ?, ?, ?)"
+NEW_GAME_SQL = "INSERT INTO games (game_mode, parent_id) VALUES (?, ?)"
+MAX_GAME_ID_SQL = "SELECT MAX(id) FROM games"
+APPEND_MOVE_SQL = """
+    INSERT INTO moves (game_id, ply, from_square, to_square, piece, captured, ability, ability_square, double_step, clock, hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+CHECKPOINT_SQL = """
+    INSERT OR REPLACE INTO checkpoints (game_id, ply, position, white_time, black_time, hash) VALUES (?, ?, ?, ?, ?, ?)
+"""
+FIRST_CHECKPOINT_SQL = """
+    SELECT ply, position, white_time, black_time FROM checkpoints
+    WHERE game_id = ? ORDER BY ply LIMIT 1
+"""
+# Diarios anteriores a la versión 6: se rellena el hash de cada jugada y punto de control
+UNHASHED_GAMES_SQL = "SELECT DISTINCT game_id FROM moves WHERE hash IS NULL"
+UNHASHED_CHECKPOINTS_SQL = "SELECT game_id, ply, position FROM checkpoints WHERE hash IS NULL"
+MOVE_HASH_SQL = "UPDATE moves SET hash = ? WHERE game_id = ? AND ply = ?"
+CHECKPOINT_HASH_SQL = "UPDATE checkpoints SET hash = ? WHERE game_id = ? AND ply = ?"
+NEAREST_CHECKPOINT_SQL = """
+    SELECT ply, position, white_time, black_time FROM checkpoints
+    WHERE game_id = ? AND ply <= ? ORDER BY ply DESC LIMIT 1
+"""
+REPLAY_SQL = """
+    SELECT ply, from_square, to_square, ability, ability_square, double_step, clock FROM moves
+    WHERE game_id = ? AND ply > ? AND ply <= ? ORDER BY ply
+"""
+LAST_PLY_SQL = "SELECT MAX(ply) FROM moves WHERE game_id = ?"
+# Exportación: tres lecturas secuenciales en orden de id que se combinan partida a partida.
+# Con MIN() SQLite devuelve las demás columnas de la fila del mínimo: el primer punto de control.
+EXPORT_GAMES_SQL = "SELECT id, game_mode, created_at FROM games ORDER BY id"
+EXPORT_STARTS_SQL = """
+    SELECT game_id, MIN(ply), position, white_time, black_time FROM checkpoints
+    GROUP BY game_id ORDER BY game_id
+"""
+EXPORT_MOVES_SQL = """
+    SELECT game_id, ply, from_square, to_square, piece, captured, ability, ability_square, double_step, clock
+    FROM moves ORDER BY game_id, ply
+"""
+IMPORT_GAME_SQL = "INSERT INTO games (id, game_mode, created_at) VALUES (?, ?, ?)"
+# Las jugadas importadas no traen el hash de la posición (no hay partidas guardadas que las usen)
+IMPORT_MOVE_SQL = """
+    INSERT INTO moves (game_id, ply, from_square, to_square, piece, captured, ability, ability_square, double_step, clock)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Partidas que se acumulan antes de cada executemany de la importación
+IMPORT_BATCH = 250
+
+# Operaciones que el hilo escritor ejecuta como mucho en una misma transacción
+MAX_WRITE_BATCH = 500
+# Segundos que una lectura del hilo del juego espera como mucho a las escrituras pendientes
+READ_FLUSH_TIMEOUT = 0.5
+
+_local = threading.local() # Conexión de cada hilo
+
+def get_connection():
+    """Devuelve la conexión de este hilo, abriéndola y configurándola solo la primera vez."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE)
+        conn.execute("PRAGMA journal_mode=WAL")   # Lectores y escritor no se bloquean entre sí
+        conn.execute("PRAGMA synchronous=NORMAL") # Sin fsync en cada commit (seguro en modo WAL)
+        conn.execute("PRAGMA foreign_keys=ON")
+        _upgrade_schema(conn)
+        _local.conn = conn
+    return conn
+
+def _upgrade_schema(conn):
+    """Crea las tablas o, si la base de datos es de una versión anterior, la convierte."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE") # Todo el cambio de esquema en una sola transacción
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(saved_games)")]
+        if 'board_state' in columns:
+            # Versión 0: se reescriben las filas JSON con la posición en binario
+            conn.execute("ALTER TABLE saved_games RENAME TO saved_games_json")
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        for table, column, declaration in ADDED_COLUMNS:
+            if column not in [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        if 'board_state' in columns:
+            conn.executemany(MIGRATE_INSERT_SQL, _migrated_rows(conn))
+            conn.execute("DROP TABLE saved_games_json")
+        if version < 6:
+            _hash_journal(conn) # El índice se rellena con los hashes del diario
+        if version < 4:
+            _index_saved_games(conn) # Las partidas que ya había entran en el índice nuevo
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _migrated_rows(conn):
+    """Filas de la tabla antigua con el tablero JSON convertido al formato binario."""
+    for game_id, name, turn, board_state_json, created_at in conn.execute(MIGRATE_SELECT_SQL):
+        position = encode_position(squares_from_state(json.loads(board_state_json)), turn)
+        yield game_id, name, turn, position, created_at
+
+class BackgroundWriter:
+    """
+    Hilo escritor de la base de datos. Recibe unidades de escritura ya preparadas (sentencias
+    SQL con sus parámetros inmutables) y las ejecuta por lotes, cada lote en una sola
+    transacción, con su propia conexión. El hilo arranca con la primera unidad.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition() # Avisa cada vez que baja el número de unidades pendientes
+        self._pending = 0
+
+    def submit(self, statements, callback=None):
+        """
+        Encola una unidad de escritura, una lista de (sql, parámetros) o funciones f(conn) que
+        se aplica entera o no se aplica, y vuelve enseguida. 'callback(ok)' se llama desde el hilo escritor cuando la
+        transacción que la contiene se ha confirmado (ok=True) o la unidad ha fallado.
+        """
+        with self._done:
+            self._pending += 1
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((tuple(statements), callback))
+
+    def flush(self, timeout=None):
+        """
+        Espera a que todas las escrituras encoladas estén en la base de datos, como mucho
+        'timeout' segundos. Devuelve False si no terminaron (tiempo agotado o hilo detenido).
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._done:
+            while self._pending:
+                thread = self._thread
+                if thread is None or not thread.is_alive():
+                    return False
+                remaining = 0.1 if deadline is None else min(0.1, deadline - time.perf_counter())
+                if remaining <= 0:
+                    return False
+                # Espera por tramos cortos para notar si el hilo escritor se detuvo
+                self._done.wait(remaining)
+            return True
+
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo (se llama al salir)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        """Cuerpo del hilo: toma lo que haya en la cola y lo escribe en una transacción."""
+        conn = get_connection()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            units = [item for item in batch if item is not None]
+            running = len(units) == len(batch) # None: orden de parar
+            try:
+                self._write_batch(conn, units)
+            finally:
+                # Pase lo que pase con el lote, las lecturas que esperan no se quedan bloqueadas
+                with self._done:
+                    self._pending -= len(units)
+                    self._done.notify_all()
+        close_db()
+
+    def _write_batch(self, conn, units):
+        """Escribe un lote de unidades en una transacción y llama a sus callbacks."""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statements, _ in units:
+                results.append(self._write_unit(conn, statements))
+            conn.commit()
+        except Exception as e:
+            # El lote entero no llegó a confirmarse
+            if conn.in_transaction:
+                conn.rollback()
+            results = [False] * len(units)
+            print(f"Error al escribir en la base de datos: {e}")
+        for (_, callback), ok in zip(units, results):
+            if callback is not None:
+                try:
+                    callback(ok)
+                except Exception as e:
+                    # Un aviso que falla no puede detener el hilo escritor
+                    print(f"Error en el aviso de una escritura: {e}")
+
+
+    @staticmethod
+    def _write_unit(conn, statements):
+        """Ejecuta una unidad bajo un SAVEPOINT: si una sentencia falla se deshace solo esa unidad."""
+        conn.execute("SAVEPOINT unit")
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn) # Escritura que depende de lo que ya hay en la base de datos
+                else:
+                    conn.execute(*statement)
+        except Exception as e: # También los errores de Python de las funciones f(conn)
+            conn.execute("ROLLBACK TO unit")
+            conn.execute("RELEASE unit")
+            print(f"Error al escribir en la base de datos: {e}")
+            return False
+        conn.execute("RELEASE unit")
         return True
-    else:
+
+
+_writer = BackgroundWriter()
+atexit.register(_writer.close) # Nada encolado se pierde aunque no se llame a close_db()
+
+def close_db():
+    """
+    Cierra la conexión de este hilo (se llama al salir del juego). Desde el hilo principal
+    también termina antes las escrituras pendientes y detiene el hilo escritor.
+    """
+    if threading.current_thread() is threading.main_thread():
+        _writer.close()
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def init_db():
+    """Inicializa la base de datos y crea las tablas si no existen."""
+    get_connection()
+
+def save_game_state(snapshot, save_name="quicksave", callback=None):
+    """
+    Guarda el estado completo de una partida (lo que devuelve Game.snapshot()) con un nombre.
+    Los datos ya vienen preparados y la escritura la hace el hilo escritor: la función no
+    espera al disco. 'callback(ok)' se llama (desde el hilo escritor) cuando ya está guardada.
+    """
+    # La posición va en el formato binario de codec.py (unos 40 bytes) y el generador
+    # aleatorio, como sus 625 enteros de estado
+    position = snapshot['position']
+    turn = decode_position(position)[1]
+    params = (save_name, turn, position, encode_rng_state(snapshot['rng_state'])) \
+        + tuple(snapshot.get(column) for column in SNAPSHOT_COLUMNS)
+
+    journal_game = snapshot.get('journal_game')
+
+    def save(conn):
+        # Las jugadas del diario van por delante en la cola: ya están en la base de datos
+        previous = conn.execute(SAVED_PLY_SQL, (save_name, journal_game)).fetchone()
+        conn.execute(SAVE_SQL, params)
+        save_id = conn.execute(SAVE_ID_SQL, (save_name,)).fetchone()[0]
+        _index_save(conn, save_id, position, snapshot['ply'], journal_game, previous[0] if previous else None)
+
+    def done(ok):
+        if ok:
+            print(f"Partida '{save_name}' guardada correctamente.")
+        if callback is not None:
+            callback(ok)
+
+    # Una partida con el mismo nombre (ej. "quicksave") se sobrescribe, y con ella sus entradas
+    # en el índice de posiciones: todo es una sola unidad del escritor
+    _writer.submit([save], done)
+
+def load_game_state(save_name="quicksave"):
+    """
+    Lee una partida guardada y la devuelve como un snapshot para Game.restore(), o None si
+    no existe. En partidas guardadas por versiones anteriores, los campos que no se
+    guardaban (modo, relojes, generador aleatorio) valen None.
+    """
+    # Un guardado recién pedido tiene que estar escrito antes de leer
+    if not _writer.flush(READ_FLUSH_TIMEOUT):
+        print("Aviso: quedan escrituras pendientes; se lee lo que ya está en la base de datos.")
+    result = get_connection().execute(LOAD_SQL, (save_name,)).fetchone()
+    if result is None:
         print(f"No se encontró una partida guardada con el nombre '{save_name}'.")
-        return False
\ No newline at end of file
+        return None
+
+    position, rng_state = result[:2]
+    snapshot = dict(zip(SNAPSHOT_COLUMNS, result[2:]))
+    snapshot['position'] = position
+    snapshot['game_over'] = bool(snapshot['game_over'])
+    snapshot['rng_state'] = decode_rng_state(rng_state) if rng_state is not None else None
+    print(f"Partida '{save_name}' cargada correctamente.")
+    return snapshot
+
+# --- Índice de posiciones ---
+
+def _signed(position_hash):
+    """Hash de 64 bits sin signo como entero con signo (el tipo INTEGER de SQLite)."""
+    return position_hash - (1 << 64) if position_hash >= 1 << 63 else position_hash
+
+def _position_hash(position):
+    """Hash (con signo) de una posición en el formato binario de codec.py."""
+    return _signed(zobrist.hash_position(*decode_position(position)))
+
+def _index_save(conn, save_id, position, ply, journal_game, previous_ply=None):
+    """
+    Indexa una partida guardada: cada posición por la que pasó según su diario (el hash que se
+    guardó con cada jugada, sin reproducir nada) y la posición guardada. Si el guardado anterior
+    con el mismo nombre era de la misma partida del diario, hasta 'previous_ply' jugadas, solo se
+    añaden las jugadas posteriores. Las partidas guardadas sin diario (versiones anteriores)
+    solo tienen la posición guardada.
+    """
+    ply = ply or 0
+    if journal_game is not None and previous_ply is not None and previous_ply <= ply:
+        conn.execute(INDEX_NEW_MOVES_SQL, (save_id, journal_game, previous_ply, ply))
+    else:
+        conn.execute(UNINDEX_SAVE_SQL, (save_id,))
+        if journal_game is not None:
+            conn.execute(INDEX_JOURNAL_SQL, {'save_id': save_id, 'journal_game': journal_game, 'ply': ply})
+    conn.execute(INDEX_SQL, (_position_hash(position), save_id, ply))
+
+def _index_saved_games(conn, batch_size=REINDEX_BATCH):
+    """
+    Indexa todas las posiciones de las partidas de saved_games leyéndolas por lotes de
+    'batch_size' en orden de id (la memoria no depende del tamaño del archivo). Devuelve el
+    número de partidas indexadas.
+    """
+    count = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(REINDEX_SELECT_SQL, (last_id, batch_size)).fetchall()
+        if not rows:
+            return count
+        for game_id, position, ply, journal_game in rows:
+            _index_save(conn, game_id, position, ply, journal_game)
+        count += len(rows)
+        last_id = rows[-1][0]
+
+def reindex_positions(batch_size=REINDEX_BATCH):
+    """Reconstruye el índice de posiciones desde cero en una sola transacción; devuelve las filas indexadas."""
+    _writer.flush()
+    conn = get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM position_index")
+        return _index_saved_games(conn, batch_size)
+
+def find_saved_games(position_hash):
+    """Partidas guardadas que pasaron por una posición (hash de GameLogic.position_hash()): [(id, nombre, ply)]."""
+    if not _writer.flush(READ_FLUSH_TIMEOUT):
+        print("Aviso: quedan escrituras pendientes; se lee lo que ya está en la base de datos.")
+    return get_connection().execute(LOOKUP_SQL, (_signed(position_hash),)).fetchall()
+
+# --- Diario de jugadas ---
+
+class JournalGame:
+    """
+    Partida del diario que acaba de empezar. Varias instancias del juego pueden escribir en la
+    misma base de datos, así que el id lo asigna SQLite al insertar la fila de games, y eso lo
+    hace el hilo escritor: el hilo del juego no espera al disco. Hasta entonces 'id' vale None.
+    Las unidades que la usan van después en la cola, y sqlite3 la convierte en su id al
+    ejecutarlas, así que se puede pasar como parámetro en lugar del id.
+    """
+    __slots__ = ('id',)
+
+    def __init__(self):
+        self.id = None
+
+sqlite3.register_adapter(JournalGame, lambda game: game.id)
+
+def start_journal(game_mode, game_logic, ply=0, white_time=None, black_time=None, parent_id=None):
+    """
+    Registra una partida nueva con su posición actual como punto de control y devuelve su
+    JournalGame. 'ply' es el número de jugadas ya hechas (distinto de 0 si sigue una partida
+    cargada) y 'parent_id', la partida del diario de la que sigue, si se conoce.
+    """
+    game = JournalGame()
+
+    def insert(conn):
+        game.id = conn.execute(NEW_GAME_SQL, (game_mode, parent_id)).lastrowid
+
+    _writer.submit([insert, (CHECKPOINT_SQL, (game, ply, encode_game(game_logic), white_time, black_time,
+                                              _signed(game_logic.position_hash())))])
+    return game
+
+def append_move(game_id, ply, record, clock=None, position_hash=None):
+    """
+    Añade al diario la jugada número 'ply' (el registro que devuelve GameLogic.apply_move) y el
+    hash de la posición resultante (GameLogic.position_hash() justo después de la jugada).
+    """
+    from_square = to_square = None
+    if record['from'] is not None:
+        from_square = record['from'][0] * 8 + record['from'][1]
+        to_square = record['to'][0] * 8 + record['to'][1]
+    _writer.submit([(APPEND_MOVE_SQL, (game_id, ply, from_square, to_square, record['piece'], record['captured'],
+                                       record['turn_ability'], record['turn_ability_square'], record['double_step'], clock,
+                                       None if position_hash is None else _signed(position_hash)))])
+
+def save_checkpoint(game_id, ply, game_logic, white_time=None, black_time=None):
+    """Guarda la posición completa tras 'ply' jugadas para no tener que reproducir desde el principio."""
+    _writer.submit([(CHECKPOINT_SQL, (game_id, ply, encode_game(game_logic), white_time, black_time,
+                                      _signed(game_logic.position_hash())))])
+
+def last_ply(game_id):
+    """Número de jugadas registradas de una partida."""
+    _writer.flush()
+    return get_connection().execute(LAST_PLY_SQL, (game_id,)).fetchone()[0] or 0
+
+def _move_ability(board, holder, piece, ability):
+    """Quita la habilidad a 'holder' y se la da a 'piece'; devuelve el nuevo portador."""
+    if holder is not None and holder.ability is not None:
+        board.set_ability(holder, None)
+    if piece is not None:
+        board.set_ability(piece, ability)
+    return piece
+
+def _replay_steps(conn, game_id, ply, from_first=False):
+    """
+    Reproduce la partida 'game_id' hasta 'ply' jugadas desde el punto de control más cercano
+    anterior (o desde el primero, con 'from_first'). Genera (k, game_logic, holder, clocks) en
+    cada posición completa tras k jugadas, con la habilidad del turno que empieza si ya está en
+    el diario; la última es la de 'ply' jugadas o la de la última jugada registrada. La lógica
+    es la misma en cada paso: hay que usarla antes de pedir el siguiente.
+    """
+    sql = FIRST_CHECKPOINT_SQL if from_first else NEAREST_CHECKPOINT_SQL
+    checkpoint = conn.execute(sql, (game_id,) if from_first else (game_id, ply)).fetchone()
+    if checkpoint is None or checkpoint[0] > ply:
+        return
+    start_ply, position, white_time, black_time = checkpoint
+    squares, turn, double_step_square = decode_position(position)
+    board = Board(squares)
+    logic = GameLogic(board)
+    logic.turn = turn
+    if double_step_square is not None:
+        logic.double_step_rook_moved = board.board[double_step_square // 8][double_step_square % 8]
+    holder = next((piece for row in board.board for piece in row if piece and piece.ability), None)
+    clocks = {'white': white_time, 'black': black_time}
+
+    # También se lee la jugada siguiente a 'ply': de ella sale la habilidad del turno que empieza
+    done = start_ply
+    for move_ply, from_square, to_square, ability, ability_square, double_step, clock in \
+            conn.execute(REPLAY_SQL, (game_id, start_ply, ply + 1)).fetchall():
+        piece = None if ability_square is None else board.board[ability_square // 8][ability_square % 8]
+        if piece is not holder or (piece is not None and piece.ability != ability):
+            holder = _move_ability(board, holder, piece, ability)
+        yield move_ply - 1, logic, holder, clocks
+        if move_ply > ply:
+            return
+        if clock is not None:
+            clocks[logic.turn] = clock
+        done = move_ply
+        if from_square is not None:
+            piece = board.board[from_square // 8][from_square % 8]
+            board.move_piece(piece, to_square // 8, to_square % 8, keep_ability=bool(double_step))
+            if double_step:
+                logic.double_step_rook_moved = piece # El mismo jugador mueve otra vez
+                continue
+        # Cambio de turno (la habilidad del turno que acaba se quita al asignar la siguiente)
+        logic.double_step_rook_moved = None
+        logic.turn = 'black' if logic.turn == 'white' else 'white'
+    yield done, logic, holder, clocks # Sin la jugada siguiente en el diario
+
+def replay_game(game_id, ply):
+    """
+    Reconstruye la partida 'game_id' tal como estaba tras 'ply' jugadas: carga el punto de control
+    más cercano anterior y vuelve a aplicar las jugadas del diario desde ahí.
+    Devuelve (game_logic, white_time, black_time), o None si la partida no existe. Como en la
+    partida real, la habilidad del turno anterior sigue puesta hasta que se asigna la siguiente:
+    si esta aún no está en el diario, hay que llamar a game_logic.assign_random_ability().
+    """
+    _writer.flush()
+    step = None
+    for step in _replay_steps(get_connection(), game_id, ply):
+        pass
+    if step is None:
+        return None
+    _, logic, holder, clocks = step
+    board = logic.board
+    logic.piece_with_ability = holder
+    if None in board.kings.values():
+        logic.game_over = True # Rey capturado: el turno no llegó a cambiar
+        logic.turn = 'black' if logic.turn == 'white' else 'white'
+    else:
+        logic.game_over = logic.check_game_over()
+    return logic, clocks['white'], clocks['black']
+
+def _hash_journal(conn):
+    """
+    Rellena el hash de las jugadas y puntos de control de un diario anterior a la versión 6.
+    Las jugadas se reproducen partida a partida desde su primer punto de control. La última
+    jugada de cada partida se queda sin hash: la habilidad del turno siguiente no está en el
+    diario (si la partida se guardó ahí, el índice ya tiene la posición guardada).
+    """
+    conn.executemany(CHECKPOINT_HASH_SQL, [(_position_hash(position), game_id, ply)
+                                           for game_id, ply, position in conn.execute(UNHASHED_CHECKPOINTS_SQL).fetchall()])
+    for (game_id,) in conn.execute(UNHASHED_GAMES_SQL).fetchall():
+        last = conn.execute(LAST_PLY_SQL, (game_id,)).fetchone()[0]
+        conn.executemany(MOVE_HASH_SQL, [(_signed(logic.position_hash()), game_id, k)
+                                         for k, logic, _, _ in _replay_steps(conn, game_id, last, from_first=True)
+                                         if k < last])
+
+def journal_games():
+    """
+    Generador de las partidas del diario en orden de id, para exportarlas: cada una es
+    (id, game_mode, created_at, start, moves), con 'start' el primer punto de control
+    (ply, position, white_time, black_time) y 'moves' sus filas de la tabla moves desde
+    'ply'. Las tablas se leen una sola vez y en memoria solo está la partida actual.
+    Las partidas sin punto de control (no se pueden reproducir) se saltan.
+    """
+    _writer.flush()
+    conn = get_connection()
+    starts = conn.execute(EXPORT_STARTS_SQL)
+    moves = conn.execute(EXPORT_MOVES_SQL)
+    start = next(starts, None)
+    move = next(moves, None)
+    for game_id, game_mode, created_at in conn.execute(EXPORT_GAMES_SQL):
+        while start is not None and start[0] < game_id:
+            start = next(starts, None)
+        game_moves = []
+        while move is not None and move[0] <= game_id:
+            if move[0] == game_id:
+                game_moves.append(move[1:])
+            move = next(moves, None)
+        if start is not None and start[0] == game_id:
+            yield game_id, game_mode, created_at, start[1:], game_moves
+
+def import_journal_games(games, batch_size=IMPORT_BATCH):
+    """
+    Añade al diario las partidas de 'games' (un iterable, que puede ser un generador) en una
+    sola transacción. Cada partida es un diccionario con 'game_mode', 'created_at',
+    'checkpoints' [(ply, position, white_time, black_time)] y 'moves' [filas de moves desde
+    'ply']; recibe un id nuevo. Las filas se insertan con executemany cada 'batch_size'
+    partidas, así que la memoria no depende del número de partidas. Devuelve cuántas se añadieron.
+    """
+    _writer.flush()
+    conn = get_connection()
+    game_rows, checkpoint_rows, move_rows = [], [], []
+
+    def insert_batch():
+        conn.executemany(IMPORT_GAME_SQL, game_rows)
+        conn.executemany(CHECKPOINT_SQL, checkpoint_rows)
+        conn.executemany(IMPORT_MOVE_SQL, move_rows)
+        game_rows.clear()
+        checkpoint_rows.clear()
+        move_rows.clear()
+
+    count = 0
+    with conn:
+        # BEGIN IMMEDIATE toma el bloqueo de escritura: ningún otro proceso inserta partidas
+        # hasta el final, así que los ids a partir de MAX(id) quedan reservados
+        conn.execute("BEGIN IMMEDIATE")
+        game_id = conn.execute(MAX_GAME_ID_SQL).fetchone()[0] or 0
+        for game in games:
+            game_id += 1
+            game_rows.append((game_id, game['game_mode'], game['created_at']))
+            checkpoint_rows.extend((game_id, *checkpoint, _position_hash(checkpoint[1])) for checkpoint in game['checkpoints'])
+            move_rows.extend((game_id, *move) for move in game['moves'])
+            count += 1
+            if count % batch_size == 0:
+                insert_batch()
+        insert_batch()
+    return count
+
+
+def main(argv=None):
+    """Tareas de mantenimiento desde la línea de órdenes (por ahora, re-indexar las posiciones)."""
+    global DB_FILE
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de ChessMagic.")
+    parser.add_argument('--reindex', action='store_true', help="reconstruir el índice de posiciones de saved_games")
+    parser.add_argument('--batch-size', type=int, default=REINDEX_BATCH, help=f"filas por lote (por defecto {REINDEX_BATCH})")
+    parser.add_argument('--db', default=DB_FILE, help="archivo de la base de datos")
+    args = parser.parse_args(argv)
+
+    DB_FILE = args.db
+    if args.reindex:
+        start = time.perf_counter()
+        count = reindex_positions(args.batch_size)
+        print(f"{count} partidas guardadas indexadas en {time.perf_counter() - start:.2f}s")
+    else:
+        parser.print_help()
+    close_db()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+# Archivo: engine.py
+# Descripción: Motor de búsqueda para jugar contra la computadora. Usa negamax con poda
+# alfa-beta, profundización iterativa, tabla de transposición y un presupuesto de tiempo
+# por jugada ligado al cronómetro del modo 'timed'.
+#
+# Reglas de la variante que entiende el motor:
+#   - La pieza con habilidad en la posición actual la usa (peón omnidireccional, doble paso).
+#     Las habilidades de turnos futuros son aleatorias, así que la búsqueda no las predice:
+#     al pasar el turno, la pieza con habilidad la pierde, igual que en assign_random_ability.
+#   - Una pieza con 'double_step_rook' mueve dos veces: tras su primer paso el mismo jugador
+#     vuelve a mover (con la misma pieza o con otra) antes de pasar el turno.
+#   - Capturar el rey termina la partida (check_king_capture).
+import time
+import config
+import zobrist
+from bitboard import SQUARES
+
+PIECE_VALUES = {'pawn': 100, 'knight': 320, 'bishop': 330, 'rook': 500, 'queen': 900, 'king': 0}
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_DEPTH = 64
+# Por encima de este valor la puntuación es un mate (o captura del rey) a cierta distancia
+MATE_THRESHOLD = MATE_SCORE - MAX_DEPTH * 4
+
+# Casillas centrales (d4, e4, d5, e5) y centro ampliado (c3 a f6)
+CENTER = sum(1 << (row * 8 + col) for row in (3, 4) for col in (3, 4))
+EXTENDED_CENTER = sum(1 << (row * 8 + col) for row in range(2, 6) for col in range(2, 6))
+
+# Tipos de entrada de la tabla de transposición
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+MAX_TT_ENTRIES = 500000
+
+
+def time_budget(remaining_seconds=None):
+    """
+    Tiempo de búsqueda para una jugada. Sin cronómetro se usa config.ENGINE_MOVE_TIME;
+    con cronómetro, una fracción del tiempo restante que nunca supera ese valor.
+    """
+    if remaining_seconds is None:
+        return config.ENGINE_MOVE_TIME
+    return max(0.05, min(config.ENGINE_MOVE_TIME, remaining_seconds / 30))
+
+
+class SearchResult:
+    """Resultado de una búsqueda: la jugada elegida y las estadísticas de rendimiento."""
+    def __init__(self, move, score, depth, nodes, elapsed):
+        self.move = move # (fila_origen, col_origen, fila_destino, col_destino) o None
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class SearchEngine:
+    """
+    Busca la mejor jugada para el jugador en turno de un GameLogic.
+    Trabaja con make_move/unmake_move sobre el tablero que recibe y lo deja como estaba,
+    por lo que conviene pasarle una copia (GameLogic.copy_for_search) si la partida sigue
+    dibujándose mientras piensa.
+    """
+    def __init__(self, max_depth=MAX_DEPTH, verbose=False):
+        self.max_depth = max_depth
+        self.verbose = verbose # Si es True se imprime el resumen de cada búsqueda
+        self.tt = {}
+        self.logic = None
+        self.board = None
+        self.holder = None
+        self.check_after_move = False
+        self.nodes = 0
+        self.deadline = 0.0
+        self.stopped = False
+        self.can_stop = False
+        self.root_move = None
+
+    def search(self, game_logic, budget):
+        """Profundización iterativa hasta agotar 'budget' segundos. Devuelve un SearchResult."""
+        self.logic = game_logic
+        self.board = game_logic.board
+        # Con bitboards los movimientos ya salen legales; con 'pieces' se comprueba el jaque
+        # tras hacer cada uno, que es más barato que filtrarlos todos antes de un corte
+        self.check_after_move = not game_logic.use_bitboards
+        self.holder = game_logic.piece_with_ability
+        self.nodes = 0
+        self.stopped = False
+        self.can_stop = False
+        if len(self.tt) > MAX_TT_ENTRIES:
+            self.tt.clear()
+
+        start = time.perf_counter()
+        self.deadline = start + budget
+        side = game_logic.turn
+        pending = game_logic.double_step_rook_moved
+        best_move, best_score, completed_depth = None, 0, 0
+
+        for depth in range(1, self.max_depth + 1):
+            self.root_move = None
+            score = self._negamax(depth, -INFINITY, INFINITY, 0, side, pending)
+            if self.stopped:
+                break
+            best_move, best_score, completed_depth = self.root_move, score, depth
+            # La profundidad 1 siempre termina; a partir de ahí se respeta el reloj
+            self.can_stop = True
+            if best_move is None or abs(score) >= MATE_THRESHOLD:
+                break # Posición terminal o mate encontrado
+            if time.perf_counter() - start > budget / 2:
+                break # La siguiente iteración casi seguro no terminaría a tiempo
+
+        elapsed = time.perf_counter() - start
+        move = None
+        if best_move is not None:
+            from_sq, to_sq = best_move
+            move = (from_sq // 8, from_sq % 8, to_sq // 8, to_sq % 8)
+        result = SearchResult(move, best_score, completed_depth, self.nodes, elapsed)
+        if self.verbose:
+            print(f"Motor: profundidad {completed_depth}, {self.nodes} nodos en {elapsed:.2f}s ({result.nodes_per_second:.0f} nodos/s)")
+        return result
+
+    # --- Búsqueda ---
+
+    def _key(self, side, pending):
+        key = self.board.zobrist_hash
+        if side == 'black':
+            key ^= zobrist.BLACK_TO_MOVE
+        if pending is not None:
+            key ^= zobrist.DOUBLE_STEP_KEYS[pending.row * 8 + pending.col]
+        return key
+
+    def _tick(self):
+        """Cuenta un nodo y, cada 1024, comprueba si se agotó el tiempo."""
+        self.nodes += 1
+        if self.can_stop and not self.nodes & 1023 and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+    def _negamax(self, depth, alpha, beta, ply, side, pending):
+        """Puntuación de la posición desde el punto de vista de 'side'."""
+        self._tick()
+        if self.stopped:
+            return 0
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply, side, pending)
+
+        key = self._key(side, pending)
+        tt_move = None
+        entry = self.tt.get(key)
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                entry_score = _score_from_tt(entry_score, ply)
+                if entry_flag == TT_EXACT:
+                    return entry_score
+                if entry_flag == TT_LOWER and entry_score >= beta:
+                    return entry_score
+                if entry_flag == TT_UPPER and entry_score <= alpha:
+                    return entry_score
+
+        board = self.board
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        legal_moves = 0
+
+        for piece, row, col, captured in self._ordered_moves(side, tt_move, captures_only=False):
+            from_sq = piece.row * 8 + piece.col
+            double_step = pending is None and piece.ability == 'double_step_rook'
+            undo = board.make_move(piece, row, col, keep_ability=double_step)
+            if self.check_after_move and self.logic.is_in_check(side):
+                board.unmake_move(undo)
+                continue
+            legal_moves += 1
+
+            if captured is not None and captured.name == 'king':
+                score = MATE_SCORE - ply
+            elif double_step:
+                # Mismo jugador: no se cambia el signo
+                score = self._negamax(depth - 1, alpha, beta, ply + 1, side, piece)
+            else:
+                score = -self._end_turn(self._negamax, side, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move(undo)
+
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                best_move = (from_sq, row * 8 + col)
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if legal_moves == 0:
+            if pending is not None:
+                # Sin segundo movimiento posible: el turno pasa sin más
+                return -self._end_turn(self._negamax, side, depth - 1, -beta, -alpha, ply + 1)
+            if self.logic.is_in_check(side):
+                return -MATE_SCORE + ply # Jaque mate
+            return 0 # Ahogado
+
+        if ply == 0:
+            self.root_move = best_move
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.tt[key] = (depth, _score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _end_turn(self, search, side, *args):
+        """
+        Pasa el turno al rival y sigue con 'search' (_negamax o _quiescence, con sus argumentos
+        hasta 'ply'); la pieza con habilidad del jugador que termina la pierde.
+        """
+        holder = self.holder
+        opponent = 'black' if side == 'white' else 'white'
+        if holder is not None and holder.color == side and holder.ability:
+            ability = holder.ability
+            self.board.set_ability(holder, None)
+            score = search(*args, opponent, None)
+            self.board.set_ability(holder, ability)
+            return score
+        return search(*args, opponent, None)
+
+    def _quiescence(self, alpha, beta, ply, side, pending):
+        """Extiende la búsqueda solo con capturas para evitar el efecto horizonte."""
+        self._tick()
+        if self.stopped:
+            return 0
+        stand_pat = self._evaluate(side)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = self.board
+        for piece, row, col, captured in self._ordered_moves(side, None, captures_only=True):
+            double_step = pending is None and piece.ability == 'double_step_rook'
+            undo = board.make_move(piece, row, col, keep_ability=double_step)
+            if self.check_after_move and self.logic.is_in_check(side):
+                board.unmake_move(undo)
+                continue
+            if captured.name == 'king':
+                score = MATE_SCORE - ply
+            elif double_step:
+                # Mismo jugador: no se cambia el signo
+                score = self._quiescence(alpha, beta, ply + 1, side, piece)
+            else:
+                score = -self._end_turn(self._quiescence, side, -beta, -alpha, ply + 1)
+            board.unmake_move(undo)
+
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _ordered_moves(self, side, tt_move, captures_only):
+        """
+        Movimientos legales (pseudo-legales con check_after_move): primero el de la tabla,
+        luego capturas (MVV-LVA).
+        """
+        board = self.board
+        grid = board.board
+        # Solo capturas: basta con quedarse con los destinos ocupados por el rival
+        targets = board.occupancy['black' if side == 'white' else 'white'] if captures_only else -1
+        scored = []
+        if self.check_after_move:
+            logic = self.logic
+            candidates = [(piece, logic.get_piece_moves_bitboard(piece) & targets)
+                          for row in grid for piece in row if piece is not None and piece.color == side]
+        else:
+            candidates = self.logic.legal_move_bitboards(side, targets)
+        for piece, moves in candidates:
+            from_sq = piece.row * 8 + piece.col
+            while moves:
+                to_bit = moves & -moves
+                moves ^= to_bit
+                to_sq = to_bit.bit_length() - 1
+                to_row, to_col = SQUARES[to_sq]
+                captured = grid[to_row][to_col]
+                if captured is None:
+                    order = 0
+                elif captured.name == 'king':
+                    order = 1000000
+                else:
+                    order = 10 * PIECE_VALUES[captured.name] - PIECE_VALUES[piece.name] + 10000
+                if tt_move is not None and tt_move[0] == from_sq and tt_move[1] == to_sq:
+                    order = 2000000
+                scored.append((order, piece, to_row, to_col, captured))
+        scored.sort(key=_order_key, reverse=True)
+        return [(piece, row, col, captured) for _, piece, row, col, captured in scored]
+
+    def _evaluate(self, side):
+        """Material más un pequeño premio por ocupar el centro, visto desde 'side'."""
+        score = 0
+        for color, sign in (('white', 1), ('black', -1)):
+            bitboards = self.board.piece_bitboards[color]
+            for name, value in PIECE_VALUES.items():
+                score += sign * value * bitboards[name].bit_count()
+            occupied = self.board.occupancy[color]
+            score += sign * (10 * (occupied & CENTER).bit_count() + 5 * (occupied & EXTENDED_CENTER).bit_count())
+        return score if side == 'white' else -score
+
+
+def _order_key(item):
+    return item[0]
+
+
+def _score_to_tt(score, ply):
+    """Los mates se guardan relativos al nodo para que sirvan desde cualquier profundidad."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
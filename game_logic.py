@@ -1,7 +1,11 @@
 # Archivo: game_logic.py
 # Descripción: Orquesta las reglas del juego, como turnos, validación de movimientos y condiciones de victoria.
 import random
-import copy
+import config
+import bitboard
+import zobrist
+from codec import encode_game, decode_position
+from pieces import ABILITY_MASK
 
 # Lista de habilidades disponibles en el juego
 POSSIBLE_ABILITIES = [
@@ -9,17 +13,75 @@ POSSIBLE_ABILITIES = [
     'double_step_rook'       # Una torre que puede dar un segundo paso después de moverse
 ]
 
+# Desplazamientos usados para buscar atacantes alrededor de una casilla
+ROOK_DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+KING_OFFSETS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_OFFSETS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+
+class LegalMoveCache:
+    """
+    Movimientos legales del jugador en turno, calculados una sola vez por posición.
+    La clave es la versión del tablero más el turno, así que cualquier movimiento real
+    (incluido el primer paso de la torre de doble paso) la invalida automáticamente.
+    """
+    def __init__(self, game_logic):
+        self.game_logic = game_logic
+        self.key = None
+        self.moves = {}
+        self.in_check = False
+
+    def refresh(self):
+        """Recalcula el mapa de movimientos si la posición cambió desde la última consulta."""
+        game_logic = self.game_logic
+        key = (game_logic.board.version, game_logic.turn)
+        if key == self.key:
+            return
+        self.moves = {}
+        if game_logic.use_bitboards:
+            for piece, moves in bitboard.legal_move_bitboards(game_logic.board, game_logic.turn):
+                self.moves[piece] = bitboard.squares_of(moves)
+        else:
+            for row in game_logic.board.board:
+                for piece in row:
+                    if piece is not None and piece.color == game_logic.turn:
+                        moves = game_logic.get_legal_moves(piece)
+                        if moves:
+                            self.moves[piece] = moves
+        self.in_check = game_logic.is_in_check(game_logic.turn)
+        self.key = key
+
+    def get(self, piece):
+        """Movimientos legales de una pieza del jugador en turno."""
+        self.refresh()
+        return self.moves.get(piece, [])
+
+    def has_moves(self):
+        """Indica si el jugador en turno tiene al menos un movimiento legal."""
+        self.refresh()
+        return bool(self.moves)
+
+    def side_in_check(self):
+        """Indica si el rey del jugador en turno está en jaque."""
+        self.refresh()
+        return self.in_check
+
 class GameLogic:
     """
     Gestiona el estado y las reglas del juego de ajedrez.
     """
-    def __init__(self, board):
+    def __init__(self, board, rng=None, verbose=True):
         self.board = board
+        # Generador aleatorio de las habilidades (un random.Random con semilla para simulaciones)
+        self.rng = rng if rng is not None else random
+        self.verbose = verbose # Si es False no se anuncian las habilidades por consola
         self.turn = 'white'  # Las blancas siempre empiezan
         self.selected_piece = None
         self.piece_with_ability = None
         self.double_step_rook_moved = None # Para rastrear la torre que acaba de moverse
         self.game_over = False
+        self.use_bitboards = config.MOVE_GENERATOR == 'bitboard'
+        self.legal_moves = LegalMoveCache(self)
 
     def next_turn(self):
         """Pasa al siguiente turno."""
@@ -37,7 +99,7 @@ class GameLogic:
         """Asigna una habilidad aleatoria a una pieza aleatoria del jugador actual."""
         # Limpiar habilidad anterior
         if self.piece_with_ability:
-            self.piece_with_ability.ability = None
+            self.board.set_ability(self.piece_with_ability, None)
             self.piece_with_ability = None
 
         player_pieces = [p for row in self.board.board for p in row if p and p.color == self.turn]
@@ -45,38 +107,93 @@ class GameLogic:
         if not player_pieces:
             return
 
-        chosen_piece = random.choice(player_pieces)
-        chosen_ability = random.choice(POSSIBLE_ABILITIES)
-        chosen_piece.ability = chosen_ability
+        chosen_piece = self.rng.choice(player_pieces)
+        chosen_ability = self.rng.choice(POSSIBLE_ABILITIES)
+        self.board.set_ability(chosen_piece, chosen_ability)
         self.piece_with_ability = chosen_piece
-        print(f"¡Habilidad '{chosen_ability}' asignada a {chosen_piece.name} en ({chosen_piece.row}, {chosen_piece.col})!")
-
-    def find_king(self, color, board_state=None):
-        """Encuentra la pieza del rey de un color específico en el tablero."""
-        board_to_check = board_state if board_state is not None else self.board.board
-        for r in range(8):
-            for c in range(8):
-                piece = board_to_check[r][c]
-                if piece and piece.name == 'king' and piece.color == color:
-                    return piece
-        return None
-
-    def is_in_check(self, color, board_state=None):
+        if self.verbose:
+            print(f"¡Habilidad '{chosen_ability}' asignada a {chosen_piece.name} en ({chosen_piece.row}, {chosen_piece.col})!")
+
+    def position_hash(self):
+        """
+        Hash Zobrist de la posición completa: piezas y habilidades (mantenido por el tablero),
+        más el turno y la torre que está a mitad de su doble paso.
+        """
+        position_hash = self.board.zobrist_hash
+        if self.turn == 'black':
+            position_hash ^= zobrist.BLACK_TO_MOVE
+        rook = self.double_step_rook_moved
+        if rook is not None:
+            position_hash ^= zobrist.DOUBLE_STEP_KEYS[rook.row * 8 + rook.col]
+        return position_hash
+
+    def find_king(self, color):
+        """Devuelve la pieza del rey de un color específico (el tablero la tiene localizada)."""
+        return self.board.kings.get(color)
+
+    def get_piece_moves(self, piece):
+        """Movimientos pseudo-legales de una pieza con el generador configurado."""
+        if self.use_bitboards:
+            return bitboard.get_piece_moves(self.board, piece)
+        return piece.get_valid_moves(self.board.board)
+
+    def get_piece_moves_bitboard(self, piece):
+        """
+        Movimientos pseudo-legales de una pieza como bitboard (bit fila * 8 + columna).
+        Con el generador 'pieces' se convierte la lista de get_valid_moves.
+        """
+        if self.use_bitboards:
+            return bitboard.piece_moves_bitboard(self.board, piece)
+        return bitboard.from_squares(piece.get_valid_moves(self.board.board))
+
+    def is_square_attacked(self, row, col, by_color):
+        """
+        Indica si alguna pieza de 'by_color' ataca la casilla (row, col).
+        Mira hacia fuera desde la casilla en lugar de generar los movimientos del rival.
+        """
+        if self.use_bitboards:
+            return bitboard.is_square_attacked(self.board, row * 8 + col, by_color)
+
+        grid = self.board.board
+        for dr, dc in KNIGHT_OFFSETS:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = grid[r][c]
+                if piece is not None and piece.color == by_color and piece.name == 'knight':
+                    return True
+
+        # Los peones blancos capturan hacia arriba, así que atacan desde la fila de abajo
+        pawn_row = row + 1 if by_color == 'white' else row - 1
+        for dr, dc in KING_OFFSETS:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = grid[r][c]
+                if piece is None or piece.color != by_color:
+                    continue
+                if piece.name == 'king':
+                    return True
+                if piece.name == 'pawn' and (piece.ability == 'omni_directional_pawn' or (r == pawn_row and dc != 0)):
+                    return True
+
+        for directions, slider in ((ROOK_DIRECTIONS, 'rook'), (BISHOP_DIRECTIONS, 'bishop')):
+            for dr, dc in directions:
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    piece = grid[r][c]
+                    if piece is not None:
+                        if piece.color == by_color and (piece.name == slider or piece.name == 'queen'):
+                            return True
+                        break
+                    r, c = r + dr, c + dc
+        return False
+
+    def is_in_check(self, color):
         """Verifica si el rey de un color específico está en jaque."""
-        board_to_check = board_state if board_state is not None else self.board.board
-        king = self.find_king(color, board_to_check)
+        king = self.board.kings.get(color)
         if not king:
             return False # No hay rey, no puede estar en jaque.
-
         opponent_color = 'white' if color == 'black' else 'black'
-        for r in range(8):
-            for c in range(8):
-                piece = board_to_check[r][c]
-                if piece and piece.color == opponent_color:
-                    valid_moves = piece.get_valid_moves(board_to_check)
-                    if (king.row, king.col) in valid_moves:
-                        return True
-        return False
+        return self.is_square_attacked(king.row, king.col, opponent_color)
 
     def is_valid_move(self, piece, target_row, target_col):
         """
@@ -86,39 +203,183 @@ class GameLogic:
         if not piece:
             return False
 
-        valid_moves = piece.get_valid_moves(self.board.board)
-        if (target_row, target_col) not in valid_moves:
+        # Las piezas del jugador en turno se consultan en la caché de la posición actual
+        if piece.color == self.turn:
+            return (target_row, target_col) in self.legal_moves.get(piece)
+
+        if not (self.get_piece_moves_bitboard(piece) >> (target_row * 8 + target_col)) & 1:
             return False # El movimiento no es legal para la pieza.
 
-        # Simular el movimiento para ver si el rey queda en jaque
-        temp_board = copy.deepcopy(self.board.board)
-        temp_board[piece.row][piece.col] = None
-        temp_board[target_row][target_col] = piece
+        return self.leaves_king_safe(piece, target_row, target_col)
 
-        # Si después de mover, el rey del jugador actual está en jaque, el movimiento no es válido.
-        if self.is_in_check(piece.color, temp_board):
-            return False
+    def leaves_king_safe(self, piece, target_row, target_col):
+        """
+        Simula el movimiento sobre el propio tablero (hacer/deshacer) y comprueba
+        que el rey del jugador que mueve no queda en jaque.
+        """
+        undo = self.board.make_move(piece, target_row, target_col, keep_ability=True)
+        in_check = self.is_in_check(piece.color)
+        self.board.unmake_move(undo)
+        return not in_check
+
+    def legal_move_bitboards(self, color, targets=-1):
+        """
+        Movimientos legales de las piezas de 'color' hacia las casillas de 'targets' como
+        [(pieza, bitboard)], solo las piezas que tienen alguno. Con bitboards salen de las
+        clavadas y el jaque de la posición, sin hacer ningún movimiento; con el generador
+        'pieces', de filtrar con leaves_king_safe cada movimiento que va a 'targets'.
+        """
+        if self.use_bitboards:
+            return bitboard.legal_move_bitboards(self.board, color, targets)
+        legal = []
+        for row in self.board.board:
+            for piece in row:
+                if piece is not None and piece.color == color:
+                    moves = bitboard.from_squares(self.get_piece_moves(piece)) & targets
+                    pseudo = moves
+                    while pseudo:
+                        lsb = pseudo & -pseudo
+                        pseudo ^= lsb
+                        if not self.leaves_king_safe(piece, *bitboard.SQUARES[lsb.bit_length() - 1]):
+                            moves ^= lsb
+                    if moves:
+                        legal.append((piece, moves))
+        return legal
 
-        return True
+    def get_legal_moves(self, piece):
+        """Devuelve los movimientos de la pieza que no dejan a su rey en jaque."""
+        if not self.use_bitboards:
+            return [move for move in self.get_piece_moves(piece)
+                    if self.leaves_king_safe(piece, move[0], move[1])]
+
+        # Se filtra sobre el bitboard y solo se convierten a casillas los movimientos legales
+        moves = legal = bitboard.piece_moves_bitboard(self.board, piece)
+        while moves:
+            lsb = moves & -moves
+            row, col = bitboard.SQUARES[lsb.bit_length() - 1]
+            if not self.leaves_king_safe(piece, row, col):
+                legal ^= lsb
+            moves ^= lsb
+        return bitboard.squares_of(legal)
 
     def check_game_over(self):
         """
         Verifica si el jugador actual está en jaque mate o ahogado.
         Devuelve True si el juego ha terminado, False en caso contrario.
         """
-        player_pieces = [p for row in self.board.board for p in row if p and p.color == self.turn]
+        # Si no hay movimientos válidos para ninguna pieza, el juego terminó.
+        # Jaque mate o ahogado se distingue después con legal_moves.side_in_check().
+        return not self.legal_moves.has_moves()
+
+    def apply_move(self, piece, row, col):
+        """
+        Ejecuta un movimiento ya validado con is_valid_move, incluida la mecánica de la
+        torre de doble paso, la captura del rey y el cambio de turno.
+        Devuelve un registro de la jugada; 'double_step' indica que la misma pieza
+        acaba de dar su primer paso y el jugador debe mover otra vez, y 'turn_ability' /
+        'turn_ability_square' son la habilidad en juego en este turno y la casilla de su pieza.
+        """
+        captured = self.board.board[row][col]
+        record = self._turn_record()
+        record.update({
+            'from': (piece.row, piece.col),
+            'to': (row, col),
+            'piece': piece.name,
+            'color': piece.color,
+            'captured': captured.name if captured else None,
+            'ability': piece.ability,
+        })
+
+        # Si es el primer movimiento de la torre de doble paso no cambiamos de turno
+        if piece.ability == 'double_step_rook' and self.double_step_rook_moved is None:
+            self.double_step_rook_moved = piece
+            self.board.move_piece(piece, row, col, keep_ability=True)
+            record['double_step'] = True
+            return record
+
+        # Para cualquier otro movimiento (incluido el segundo de la torre)
+        self.board.move_piece(piece, row, col)
+
+        # Comprobar si el movimiento resultó en la captura del rey
+        self.check_king_capture(piece.color)
+
+        # Si el juego no ha terminado por captura, pasar al siguiente turno
+        if not self.game_over:
+            self.next_turn()
+        return record
+
+    def pass_turn(self):
+        """
+        Pasa el turno sin mover (la torre de doble paso no tiene segundo movimiento).
+        Devuelve un registro como el de apply_move, sin casillas ni pieza.
+        """
+        record = self._turn_record()
+        self.next_turn()
+        return record
+
+    def _turn_record(self):
+        """Registro vacío de una jugada del turno actual, con la habilidad que está en juego."""
+        holder = self.piece_with_ability
+        return {
+            'from': None,
+            'to': None,
+            'piece': None,
+            'color': self.turn,
+            'captured': None,
+            'ability': None,
+            'double_step': False,
+            'turn_ability': holder.ability if holder else None,
+            'turn_ability_square': holder.row * 8 + holder.col if holder else None,
+        }
+
+    def snapshot(self):
+        """
+        Estado completo de la lógica como datos inmutables: la posición codificada (piezas con
+        su habilidad y has_moved, turno y torre a mitad del doble paso) y su hash, si la partida
+        terminó y el estado del generador aleatorio de las habilidades.
+        """
+        return {
+            'position': encode_game(self),
+            'position_hash': self.position_hash(),
+            'game_over': self.game_over,
+            'rng_state': self.rng.getstate(),
+        }
+
+    def restore(self, snapshot):
+        """Vuelve exactamente al estado de un snapshot(), reconstruyendo el tablero en una pasada."""
+        squares, turn, double_step_square = decode_position(snapshot['position'])
+        board = self.board
+        board.load_squares(squares)
+        self.turn = turn
+        self.double_step_rook_moved = None
+        if double_step_square is not None:
+            self.double_step_rook_moved = board.board[double_step_square >> 3][double_step_square & 7]
+        # Solo una pieza tiene a la vez los bits de habilidad: la que la recibió en este turno
+        self.piece_with_ability = None
+        for sq, code in enumerate(squares):
+            if code & ABILITY_MASK:
+                self.piece_with_ability = board.board[sq >> 3][sq & 7]
+                break
+        self.game_over = snapshot['game_over']
+        self.selected_piece = None
+        if snapshot['rng_state'] is not None: # Las partidas guardadas antiguas no lo tienen
+            self.rng.setstate(snapshot['rng_state'])
+
+    def copy_for_search(self):
+        """Copia independiente de la lógica y el tablero para simular jugadas sin tocar la partida."""
+        clone = GameLogic(self.board.clone(), verbose=False)
+        clone.turn = self.turn
+        clone.game_over = self.game_over
+        clone.use_bitboards = self.use_bitboards
+        clone.piece_with_ability = self._same_piece_in(clone.board, self.piece_with_ability)
+        clone.double_step_rook_moved = self._same_piece_in(clone.board, self.double_step_rook_moved)
+        return clone
 
-        # Iterar sobre cada pieza del jugador del turno actual
-        for piece in player_pieces:
-            valid_moves = piece.get_valid_moves(self.board.board)
-            for move in valid_moves:
-                # Si encontramos al menos un movimiento válido, el juego no ha terminado
-                if self.is_valid_move(piece, move[0], move[1]):
-                    return False
-
-        # Si no se encontraron movimientos válidos para ninguna pieza, el juego terminó.
-        # Ahora determinamos si es jaque mate o ahogado.
-        return True
+    def _same_piece_in(self, other_board, piece):
+        """Pieza de 'other_board' que ocupa la casilla de 'piece' (None si 'piece' ya no está en juego)."""
+        if piece is None or self.board.board[piece.row][piece.col] is not piece:
+            return None
+        return other_board.board[piece.row][piece.col]
 
     def activate_ability(self, piece):
         """
@@ -0,0 +1,171 @@
+# Archivo: instrumentation.py
+# Descripción: Medición de tiempos por secciones con nombre (eventos, update, dibujado,
+# llamadas a la lógica del juego...). Guarda los últimos tiempos para calcular percentiles
+# que se muestran en pantalla y, opcionalmente, escribe una traza en formato Chrome
+# (chrome://tracing o https://ui.perfetto.dev) al salir.
+#
+# Desactivado, section() devuelve siempre el mismo contexto vacío y los métodos
+# instrumentados con instrument() vuelven a ser los originales, así que el coste es
+# prácticamente nulo.
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Fotogramas (y llamadas por sección) que se usan para los percentiles
+WINDOW_SIZE = 300
+# Límite de eventos de la traza, para que una sesión larga no agote la memoria
+MAX_TRACE_EVENTS = 500000
+
+
+class _NullSection:
+    """Contexto que no hace nada: lo que devuelve section() con la medición apagada."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SECTION = _NullSection()
+
+
+class _Section:
+    """Contexto que mide el tiempo de una sección y lo registra al salir."""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler:
+    """Registro de tiempos por sección y por fotograma."""
+    def __init__(self, enabled=False):
+        self.enabled = False
+        self.origin = time.perf_counter() # Instante cero de la traza
+        self.frame_times = deque(maxlen=WINDOW_SIZE)
+        self.section_times = {} # nombre -> deque con las últimas duraciones
+        self.trace_events = []
+        self.pid = os.getpid()
+        self._instrumented = {} # etiqueta -> (clase o instancia, nombre del método) a envolver al activar
+        self._originals = {}    # etiqueta -> (clase o instancia, nombre, método original)
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        """Empieza a medir y envuelve los métodos registrados con instrument()."""
+        if self.enabled:
+            return
+        self.enabled = True
+        for label, (owner, name) in self._instrumented.items():
+            self._wrap(label, owner, name)
+
+    def disable(self):
+        """Deja de medir y restaura los métodos originales."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        for label in list(self._originals):
+            self._unwrap(label)
+
+    def section(self, name):
+        """Contexto 'with' que mide una sección con nombre."""
+        if not self.enabled:
+            return NULL_SECTION
+        return _Section(self, name)
+
+    def instrument(self, owner, *names):
+        """
+        Mide los métodos 'names' de 'owner' mientras la medición esté activa. 'owner' puede ser
+        una clase (todas sus instancias) o una instancia concreta: así las copias que usa otro
+        hilo (la búsqueda del motor) no entran en los tiempos del fotograma. Instrumentar otra
+        instancia de la misma clase sustituye a la anterior (p. ej. al reiniciar la partida).
+        """
+        for name in names:
+            label = f"{owner.__name__ if isinstance(owner, type) else type(owner).__name__}.{name}"
+            if label in self._originals:
+                self._unwrap(label)
+            self._instrumented[label] = (owner, name)
+            if self.enabled:
+                self._wrap(label, owner, name)
+
+    def _wrap(self, label, owner, name):
+        # De una instancia se envuelve el método enlazado y se guarda como atributo suyo
+        method = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+        profiler = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profiler.record(label, start, time.perf_counter())
+
+        timed.__name__ = method.__name__
+        timed.__doc__ = method.__doc__
+        self._originals[label] = (owner, name, method)
+        setattr(owner, name, timed)
+
+    def _unwrap(self, label):
+        owner, name, method = self._originals.pop(label)
+        if isinstance(owner, type):
+            setattr(owner, name, method)
+        else:
+            delattr(owner, name) # Vuelve a usarse el método de la clase
+
+    def record(self, name, start, end):
+        """Registra una duración medida (puede llamarse desde cualquier hilo)."""
+        times = self.section_times.get(name)
+        if times is None:
+            times = self.section_times[name] = deque(maxlen=WINDOW_SIZE)
+        times.append(end - start)
+        if len(self.trace_events) < MAX_TRACE_EVENTS:
+            self.trace_events.append({
+                'name': name,
+                'ph': 'X', # Evento completo: inicio y duración
+                'ts': (start - self.origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': self.pid,
+                'tid': threading.get_ident(),
+            })
+
+    def end_frame(self, start):
+        """Cierra un fotograma que empezó en 'start' (trabajo del bucle, sin la espera)."""
+        if not self.enabled:
+            return
+        end = time.perf_counter()
+        self.frame_times.append(end - start)
+        self.record('frame', start, end)
+
+    def percentiles(self, values=None):
+        """Percentiles 50, 95 y 99 (en milisegundos) de las últimas duraciones."""
+        values = sorted(self.frame_times if values is None else values)
+        if not values:
+            return 0.0, 0.0, 0.0
+        last = len(values) - 1
+        return tuple(values[round(last * p)] * 1000 for p in (0.50, 0.95, 0.99))
+
+    def slowest_sections(self, count):
+        """Las 'count' secciones con mayor tiempo medio: [(nombre, ms)]."""
+        means = [(name, sum(times) / len(times) * 1000) for name, times in self.section_times.items()
+                 if name != 'frame' and times]
+        means.sort(key=lambda item: item[1], reverse=True)
+        return means[:count]
+
+    def write_trace(self, path):
+        """Escribe la traza en formato Chrome (JSON) en 'path'."""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Traza de rendimiento guardada en {path} ({len(self.trace_events)} eventos)")
@@ -0,0 +1,219 @@
+# Archivo: perft.py
+# Descripción: Herramienta perft para las reglas de ChessMagic. Cuenta las posiciones hoja
+# hasta una profundidad dada, muestra el desglose por profundidad y los nodos por segundo,
+# y sirve como banco de pruebas de rendimiento del generador de movimientos.
+#
+# Uso:
+#   python perft.py --depth 4                      # todas las posiciones guardadas
+#   python perft.py --position omni --generator bitboard
+#   python perft.py --check                        # compara con los conteos esperados
+#   python perft.py --save-baseline                # guarda los nodos/s de esta máquina
+#   python perft.py --bench                        # falla si el rendimiento cae bajo la referencia
+#
+# Cada parte de un movimiento cuenta como una profundidad: el primer paso de una pieza con
+# 'double_step_rook' deja al mismo jugador en turno. Al pasar el turno, la pieza con
+# habilidad la pierde y no se asigna otra (la asignación es aleatoria), y capturar el rey
+# termina la partida.
+import argparse
+import json
+import os
+import sys
+import time
+
+import config
+from bitboard import SQUARES
+from board import Board
+from game_logic import GameLogic
+
+BASELINE_FILE = os.path.join(config.BASE_DIR, 'perft_baseline.json')
+
+PIECE_LETTERS = {'p': 'pawn', 'r': 'rook', 'n': 'knight', 'b': 'bishop', 'q': 'queen', 'k': 'king'}
+START_ROWS = {'white': (6, 7), 'black': (1, 0)}  # (fila de peones, fila de piezas)
+
+# Posiciones guardadas. Filas de arriba (fila 0, negras) a abajo; mayúsculas = blancas.
+# 'ability' asigna una habilidad a la pieza de una casilla y 'double_step' indica que esa
+# pieza ya dio el primer paso de su doble movimiento.
+POSITIONS = {
+    'inicial': {
+        'rows': ['rnbqkbnr', 'pppppppp', '........', '........',
+                 '........', '........', 'PPPPPPPP', 'RNBQKBNR'],
+        'turn': 'white',
+        'expected': {1: 20, 2: 400, 3: 8902, 4: 197281},
+    },
+    'omni': {
+        'rows': ['rnbqkbnr', 'pppp.ppp', '........', '....p...',
+                 '...P....', '........', 'PPP.PPPP', 'RNBQKBNR'],
+        'turn': 'white',
+        'ability': (4, 3, 'omni_directional_pawn'),
+        'expected': {1: 35, 2: 1067, 3: 31014, 4: 955432},
+    },
+    'doble_paso': {
+        'rows': ['r...k..r', 'ppp..ppp', '..n.bn..', '...pp...',
+                 '........', '..N..N..', 'PPPPPPPP', 'R...K..R'],
+        'turn': 'white',
+        'ability': (7, 0, 'double_step_rook'),
+        'expected': {1: 30, 2: 1028, 3: 31110, 4: 1061622},
+    },
+    'doble_paso_pendiente': {
+        'rows': ['....k...', '........', '........', '........',
+                 '........', '........', '...R....', '....K...'],
+        'turn': 'white',
+        'ability': (6, 3, 'double_step_rook'),
+        'double_step': (6, 3),
+        'expected': {1: 18, 2: 64, 3: 1150, 4: 6532},
+    },
+}
+
+
+def load_position(spec, use_bitboards=False):
+    """Construye un GameLogic a partir de una posición guardada."""
+    board_state = []
+    for r, row_text in enumerate(spec['rows']):
+        row_state = []
+        for letter in row_text:
+            if letter == '.':
+                row_state.append(None)
+                continue
+            color = 'white' if letter.isupper() else 'black'
+            name = PIECE_LETTERS[letter.lower()]
+            # Los peones fuera de su fila inicial (y el resto de piezas fuera de la suya) ya se movieron
+            home_row = START_ROWS[color][0 if name == 'pawn' else 1]
+            row_state.append({'type': name, 'color': color, 'ability': None, 'has_moved': r != home_row})
+        board_state.append(row_state)
+
+    board = Board()
+    board.load_from_state(board_state)
+    logic = GameLogic(board)
+    logic.use_bitboards = use_bitboards
+    logic.turn = spec['turn']
+    if 'ability' in spec:
+        row, col, ability = spec['ability']
+        logic.piece_with_ability = board.board[row][col]
+        board.set_ability(logic.piece_with_ability, ability)
+    if 'double_step' in spec:
+        row, col = spec['double_step']
+        logic.double_step_rook_moved = board.board[row][col]
+    return logic
+
+
+def perft(logic, depth, side=None, pending=None):
+    """Número de posiciones hoja a 'depth' partes de movimiento desde la posición actual."""
+    if side is None:
+        side = logic.turn
+        pending = logic.double_step_rook_moved
+    if depth == 0:
+        return 1
+
+    board = logic.board
+    grid = board.board
+    opponent = 'black' if side == 'white' else 'white'
+    legal = logic.legal_move_bitboards(side)
+    if depth == 1:
+        # Los movimientos ya son legales: las hojas se cuentan sin hacerlos
+        nodes = legal_moves = sum(moves.bit_count() for _, moves in legal)
+    else:
+        nodes = legal_moves = 0
+        for piece, moves in legal:
+            double_step = pending is None and piece.ability == 'double_step_rook'
+            while moves:
+                to_bit = moves & -moves
+                moves ^= to_bit
+                row, col = SQUARES[to_bit.bit_length() - 1]
+                captured = grid[row][col]
+                legal_moves += 1
+                if captured is not None and captured.name == 'king':
+                    continue # Partida terminada: no hay más nodos por debajo
+                undo = board.make_move(piece, row, col, keep_ability=double_step)
+                if double_step:
+                    nodes += perft(logic, depth - 1, side, piece)
+                else:
+                    nodes += _end_turn(logic, depth - 1, side, opponent)
+                board.unmake_move(undo)
+
+    if legal_moves == 0 and pending is not None:
+        # La torre de doble paso no tiene segundo movimiento: el turno pasa sin más
+        return _end_turn(logic, depth - 1, side, opponent)
+    return nodes
+
+
+def _end_turn(logic, depth, side, opponent):
+    """Pasa el turno: la pieza con habilidad del jugador que termina la pierde."""
+    holder = logic.piece_with_ability
+    if holder is not None and holder.color == side and holder.ability:
+        ability = holder.ability
+        logic.board.set_ability(holder, None)
+        nodes = perft(logic, depth, opponent, None)
+        logic.board.set_ability(holder, ability)
+        return nodes
+    return perft(logic, depth, opponent, None)
+
+
+def run_position(name, depth, use_bitboards):
+    """Ejecuta perft de 1 a 'depth' sobre una posición. Devuelve [(profundidad, nodos, segundos)]."""
+    logic = load_position(POSITIONS[name], use_bitboards)
+    results = []
+    for d in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(logic, d)
+        results.append((d, nodes, time.perf_counter() - start))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft y banco de pruebas del generador de movimientos de ChessMagic.")
+    parser.add_argument('--depth', type=int, default=3, help="profundidad máxima (por defecto 3)")
+    parser.add_argument('--position', default='all', choices=['all'] + list(POSITIONS), help="posición a analizar")
+    parser.add_argument('--generator', default=config.MOVE_GENERATOR, choices=['pieces', 'bitboard'], help="generador de movimientos")
+    parser.add_argument('--check', action='store_true', help="comprobar los conteos esperados")
+    parser.add_argument('--bench', action='store_true', help="fallar si los nodos/s caen por debajo de la referencia")
+    parser.add_argument('--save-baseline', action='store_true', help="guardar los nodos/s medidos como referencia")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="archivo de referencia de rendimiento")
+    parser.add_argument('--tolerance', type=float, default=0.8, help="fracción mínima de la referencia (por defecto 0.8)")
+    args = parser.parse_args(argv)
+
+    names = list(POSITIONS) if args.position == 'all' else [args.position]
+    use_bitboards = args.generator == 'bitboard'
+    failures = []
+    throughput = {}
+
+    for name in names:
+        print(f"{name} ({args.generator}):")
+        total_nodes, total_time = 0, 0.0
+        for d, nodes, elapsed in run_position(name, args.depth, use_bitboards):
+            nps = nodes / elapsed if elapsed > 0 else 0.0
+            print(f"  profundidad {d}: {nodes} nodos en {elapsed:.3f}s ({nps:.0f} nodos/s)")
+            total_nodes += nodes
+            total_time += elapsed
+            expected = POSITIONS[name]['expected'].get(d)
+            if args.check and expected is not None and nodes != expected:
+                failures.append(f"{name} profundidad {d}: {nodes} nodos, se esperaban {expected}")
+        throughput[name] = total_nodes / total_time if total_time > 0 else 0.0
+
+    key = f"{args.generator}:{args.depth}"
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.setdefault(key, {}).update(throughput)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Referencia guardada en {args.baseline}")
+
+    if args.bench:
+        if not os.path.exists(args.baseline):
+            failures.append(f"No existe la referencia {args.baseline}; ejecuta antes con --save-baseline")
+        else:
+            with open(args.baseline) as f:
+                reference = json.load(f).get(key, {})
+            for name, nps in throughput.items():
+                if name in reference and nps < reference[name] * args.tolerance:
+                    failures.append(f"{name}: {nps:.0f} nodos/s, referencia {reference[name]:.0f} nodos/s")
+
+    for failure in failures:
+        print(f"FALLO: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
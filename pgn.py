@@ -0,0 +1,319 @@
+# Archivo: pgn.py
+# Descripción: Exportación e importación de las partidas del diario (tablas games, moves y
+# checkpoints) en un formato de texto parecido a PGN, ampliado con las habilidades de ChessMagic.
+#
+# Uso:
+#   python pgn.py export partidas.pgn              # todas las partidas del diario
+#   python pgn.py import partidas.pgn              # las añade al diario con ids nuevos
+#   python pgn.py export - | gzip > partidas.pgn.gz
+#   gunzip -c partidas.pgn.gz | python pgn.py import - --db otra.db
+#
+# Cada partida son sus etiquetas y su lista de jugadas:
+#   [Event "ChessMagic"]
+#   [Date "2026.10.18"]
+#   [Time "17:02:11"]          Date y Time: created_at de la partida (UTC)
+#   [GameId "12"]              id en la base de datos de origen (al importar recibe uno nuevo)
+#   [Mode "timed"]
+#   [StartPly "0"]             jugadas ya hechas en la posición de partida
+#   [Position "01000000..."]   posición de partida en hexadecimal (formato de codec.py)
+#   [WhiteClock "600.0"]       relojes en la posición de partida, si los hay
+#   [BlackClock "600.0"]
+#   [Result "*"]
+#
+#   1. {ability=omni_directional_pawn@e2} Pe2-e3 {clk=598.5} {ability=double_step_rook@a8}
+#   Ra8-a6xa2 {clk=597.1,596.9} 2. ...
+#
+# - Jugadas en notación larga: letra de la pieza (P, N, B, R, Q, K), casilla de origen, '-'
+#   o 'x' (captura) y casilla de destino. '--' es un turno pasado.
+# - Con 'double_step_rook' la pieza da un primer paso y el mismo jugador mueve otra vez. Si
+#   vuelve a mover la misma pieza, las dos partes van en una sola jugada (Ra8-a6xa2); si no,
+#   la primera parte va sola y le sigue la otra jugada, o '--' si no hay segundo movimiento.
+# - {ability=nombre@casilla} es la habilidad del turno que empieza ({ability=-}: ninguna); se
+#   escribe solo cuando cambia.
+# - {clk=segundos} es el reloj de quien mueve al hacer la jugada (uno por parte).
+#
+# Las dos direcciones son generadores que van partida a partida, así que la memoria no depende
+# del número de partidas. La importación sigue la posición byte a byte, sin generar movimientos:
+# le basta para saber qué se captura, reconocer el doble paso y guardar un punto de control
+# cada JOURNAL_CHECKPOINT_INTERVAL jugadas, como la partida original.
+import argparse
+import contextlib
+import re
+import sys
+import time
+
+import config
+import database
+from board import Board
+from codec import encode_position, decode_position
+from pieces import PIECE_TYPES, TYPE_MASK, BLACK_FLAG, MOVED_FLAG, ABILITY_MASK, ABILITY_CODES, ABILITIES_BY_CODE
+
+FILES = 'abcdefgh'
+LETTERS = {'pawn': 'P', 'knight': 'N', 'bishop': 'B', 'rook': 'R', 'queen': 'Q', 'king': 'K'}
+PIECES_BY_LETTER = {letter: name for name, letter in LETTERS.items()}
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+LINE_WIDTH = 80
+DOUBLE_STEP_CODE = ABILITY_CODES['double_step_rook']
+
+# Casilla (fila * 8 + columna, la fila 0 es la de las negras) en notación algebraica: 0 -> 'a8'
+SQUARE_NAMES = [FILES[square % 8] + str(8 - square // 8) for square in range(64)]
+SQUARES = {name: square for square, name in enumerate(SQUARE_NAMES)}
+
+TAG_RE = re.compile(r'\[(\w+)\s+"(.*)"\]$')
+# Una sola expresión para todo el texto de jugadas: findall da una tupla por elemento
+TOKEN_RE = re.compile(r"""
+      \{ability=([^}@]*)(?:@([a-h][1-8]))?\}
+    | \{clk=([^}]*)\}
+    | \{[^}]*\}
+    | ([PNBRQK])([a-h][1-8])([-x])([a-h][1-8])(?:([-x])([a-h][1-8]))?(?=[\s{]|$)
+    | (--)(?=[\s{]|$)
+    | ([^\s{]+)
+""", re.VERBOSE)
+MOVE_NUMBER_RE = re.compile(r'\d+\.(\.\.)?$')
+
+
+# --- Exportación ---
+
+def format_game(game_id, game_mode, created_at, start, moves):
+    """Texto de una partida tal como la devuelve database.journal_games()."""
+    start_ply, position, white_time, black_time = start
+    turn = decode_position(position)[1]
+
+    tokens = []
+    number = 1
+    assignment = None # (habilidad, casilla) anunciada por última vez
+    mid_turn = False  # La jugada anterior fue una primera parte de doble paso sin la segunda
+    result = '*'
+    i = 0
+    while i < len(moves):
+        _, from_square, to_square, piece, captured, ability, ability_square, double_step, clock = moves[i]
+        i += 1
+        if not mid_turn:
+            if turn == 'white':
+                tokens.append(f'{number}.')
+            elif not tokens:
+                tokens.append(f'{number}...')
+        if (ability, ability_square) != assignment:
+            assignment = (ability, ability_square)
+            tokens.append('{ability=-}' if ability is None else f'{{ability={ability}@{SQUARE_NAMES[ability_square]}}}')
+
+        clocks = [clock]
+        mid_turn = False
+        if from_square is None:
+            tokens.append('--')
+        else:
+            text = LETTERS[piece] + SQUARE_NAMES[from_square] + ('x' if captured else '-') + SQUARE_NAMES[to_square]
+            if double_step:
+                assignment = (ability, to_square) # La habilidad viaja con la torre
+                # La segunda parte es la jugada siguiente si sale de donde acabó la primera
+                if i < len(moves) and moves[i][1] == to_square:
+                    _, _, second_square, _, captured, _, _, _, second_clock = moves[i]
+                    i += 1
+                    text += ('x' if captured else '-') + SQUARE_NAMES[second_square]
+                    clocks.append(second_clock)
+                else:
+                    mid_turn = True
+            tokens.append(text)
+            if captured == 'king':
+                result = '1-0' if turn == 'white' else '0-1'
+        if any(value is not None for value in clocks):
+            tokens.append('{clk=' + ','.join('-' if value is None else repr(value) for value in clocks) + '}')
+        if not mid_turn:
+            if turn == 'black':
+                number += 1
+            turn = 'black' if turn == 'white' else 'white'
+    tokens.append(result)
+
+    date, _, clock_time = (created_at or '').partition(' ')
+    tags = [('Event', 'ChessMagic')]
+    if date:
+        tags += [('Date', date.replace('-', '.')), ('Time', clock_time)]
+    tags += [('GameId', game_id), ('Mode', game_mode or '?'), ('StartPly', start_ply), ('Position', position.hex())]
+    if white_time is not None or black_time is not None:
+        tags += [('WhiteClock', white_time), ('BlackClock', black_time)]
+    tags.append(('Result', result))
+
+    lines = [f'[{name} "{value}"]' for name, value in tags]
+    lines.append('')
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def export_games(games):
+    """Generador del texto de cada partida de 'games' (por ejemplo, database.journal_games())."""
+    for game in games:
+        yield format_game(*game)
+
+
+# --- Importación ---
+
+def read_games(lines):
+    """
+    Generador de las partidas de un texto leído línea a línea (un archivo abierto sirve),
+    listas para database.import_journal_games. Lanza ValueError si una partida no es válida.
+    """
+    tags = {}
+    movetext = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line.startswith('['):
+            if movetext: # Empiezan las etiquetas de la partida siguiente
+                yield parse_game(tags, movetext)
+                tags = {}
+                movetext = []
+            match = TAG_RE.match(line)
+            if match is None:
+                raise ValueError(f"Línea {line_number}: etiqueta no válida: {line}")
+            tags[match.group(1)] = match.group(2)
+        elif line and not line.startswith('%'): # '%': línea de escape de PGN
+            movetext.append(line)
+    if tags or movetext:
+        yield parse_game(tags, movetext)
+
+
+def _optional_float(value):
+    return None if value in (None, '', 'None', '-') else float(value)
+
+
+def parse_game(tags, movetext):
+    """Convierte las etiquetas y las líneas de jugadas de una partida en filas del diario."""
+    game_name = f"Partida {tags.get('GameId', '?')}"
+    if 'Position' in tags:
+        position = bytes.fromhex(tags['Position'])
+        squares, turn, double_step_square = decode_position(position)
+    else: # Sin posición: la inicial, con las blancas en turno
+        squares, turn, double_step_square = Board().squares, 'white', None
+        position = encode_position(squares, turn)
+    ply = start_ply = int(tags.get('StartPly', 0))
+    clocks = {'white': _optional_float(tags.get('WhiteClock')), 'black': _optional_float(tags.get('BlackClock'))}
+    holder = next((square for square in range(64) if squares[square] & ABILITY_MASK), None)
+    ability = None if holder is None else ABILITIES_BY_CODE[squares[holder] & ABILITY_MASK]
+
+    checkpoints = [(start_ply, position, clocks['white'], clocks['black'])]
+    moves = []
+    last_rows = [] # Filas de la última jugada leída (de 'mover'), para su {clk=...}
+    mover = turn
+
+    def checkpoint():
+        """Cada JOURNAL_CHECKPOINT_INTERVAL jugadas, un punto de control, como en la partida original."""
+        if ply % config.JOURNAL_CHECKPOINT_INTERVAL == 0 and ply > start_ply:
+            checkpoints.append((ply, encode_position(squares, turn, double_step_square), clocks['white'], clocks['black']))
+
+    def play(from_square, to_square, capture, letter):
+        """Aplica una parte de una jugada a 'squares' y añade su fila; devuelve si fue un primer paso doble."""
+        nonlocal ply, turn, double_step_square, holder
+        checkpoint()
+        code = squares[from_square]
+        target = squares[to_square]
+        color_flag = BLACK_FLAG if turn == 'black' else 0
+        if (not code or code & BLACK_FLAG != color_flag or PIECE_TYPES[code & TYPE_MASK] != PIECES_BY_LETTER[letter]
+                or bool(target) != capture or (target and target & BLACK_FLAG == color_flag)):
+            raise ValueError(f"{game_name}: {letter}{SQUARE_NAMES[from_square]}{SQUARE_NAMES[to_square]} "
+                             f"no corresponde a la posición (jugada {ply + 1})")
+        double_step = double_step_square is None and code & ABILITY_MASK == DOUBLE_STEP_CODE
+        moves.append([ply + 1, from_square, to_square, PIECE_TYPES[code & TYPE_MASK],
+                      PIECE_TYPES[target & TYPE_MASK] if target else None, ability, holder, int(double_step), None])
+        ply += 1
+        squares[from_square] = 0
+        if double_step: # El mismo jugador mueve otra vez, y la habilidad viaja con la pieza
+            squares[to_square] = code | MOVED_FLAG
+            double_step_square = holder = to_square
+        else:
+            squares[to_square] = (code | MOVED_FLAG) & ~ABILITY_MASK
+            double_step_square = None
+            turn = 'black' if turn == 'white' else 'white'
+        return double_step
+
+    for (ability_name, holder_name, clock_values, letter, from_name, separator, to_name,
+         second_separator, second_name, pass_mark, other) in TOKEN_RE.findall(' '.join(movetext)):
+        if letter or pass_mark:
+            # El diario dice quién tiene la habilidad del turno: su pieza lleva los bits
+            if holder is not None and squares[holder]:
+                squares[holder] = squares[holder] & ~ABILITY_MASK | ABILITY_CODES[ability]
+            first = len(moves)
+            mover = turn
+            if pass_mark:
+                checkpoint()
+                moves.append([ply + 1, None, None, None, None, ability, holder, 0, None])
+                ply += 1
+                double_step_square = None
+                turn = 'black' if turn == 'white' else 'white'
+            elif play(SQUARES[from_name], SQUARES[to_name], separator == 'x', letter):
+                if second_name:
+                    play(SQUARES[to_name], SQUARES[second_name], second_separator == 'x', letter)
+            elif second_name:
+                raise ValueError(f"{game_name}: la jugada {ply} tiene dos partes pero no es un doble paso")
+            last_rows = moves[first:]
+        elif clock_values:
+            for row, clock in zip(last_rows, clock_values.split(',')):
+                row[8] = _optional_float(clock)
+                if row[8] is not None:
+                    clocks[mover] = row[8]
+        elif ability_name:
+            if holder is not None:
+                squares[holder] &= ~ABILITY_MASK
+            if ability_name == '-':
+                ability = holder = None
+            elif ability_name in ABILITY_CODES and holder_name:
+                ability, holder = ability_name, SQUARES[holder_name]
+            else:
+                raise ValueError(f"{game_name}: habilidad no válida: {ability_name}@{holder_name}")
+        elif other and not (MOVE_NUMBER_RE.match(other) or other in RESULTS):
+            raise ValueError(f"{game_name}: jugada no válida: {other!r}")
+    checkpoint()
+
+    created_at = None
+    if 'Date' in tags:
+        created_at = f"{tags['Date'].replace('.', '-')} {tags.get('Time') or '00:00:00'}"
+    return {
+        'game_mode': None if tags.get('Mode', '?') == '?' else tags['Mode'],
+        'created_at': created_at or time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+        'checkpoints': checkpoints,
+        'moves': moves,
+    }
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o importa las partidas del diario en formato tipo PGN.")
+    parser.add_argument('action', choices=('export', 'import'))
+    parser.add_argument('file', help="archivo de partidas ('-': salida o entrada estándar)")
+    parser.add_argument('--db', default=database.DB_FILE, help="archivo de la base de datos")
+    parser.add_argument('--batch-size', type=int, default=database.IMPORT_BATCH,
+                        help=f"partidas por executemany al importar (por defecto {database.IMPORT_BATCH})")
+    args = parser.parse_args(argv)
+
+    database.DB_FILE = args.db
+    # Si los datos van por la salida estándar, los mensajes van a stderr
+    messages = sys.stderr if args.file == '-' else sys.stdout
+    start = time.perf_counter()
+    if args.action == 'export':
+        count = 0
+        # Los flujos estándar no se cierran: solo los archivos que se abren aquí
+        with contextlib.nullcontext(sys.stdout) if args.file == '-' else open(args.file, 'w', encoding='utf-8') as f:
+            for text in export_games(database.journal_games()):
+                f.write(text)
+                count += 1
+        print(f"{count} partidas exportadas en {time.perf_counter() - start:.2f}s", file=messages)
+    else:
+        try:
+            with contextlib.nullcontext(sys.stdin) if args.file == '-' else open(args.file, encoding='utf-8') as f:
+                count = database.import_journal_games(read_games(f), args.batch_size)
+        except ValueError as e: # La transacción se deshace entera
+            print(f"Error: {e} (no se ha importado ninguna partida)", file=sys.stderr)
+            database.close_db()
+            return 1
+        print(f"{count} partidas importadas en {time.perf_counter() - start:.2f}s", file=messages)
+    database.close_db()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
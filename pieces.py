@@ -1,16 +1,27 @@
 # Archivo: pieces.py
 # Descripción: Define la clase base Piece y las clases para cada tipo de pieza.
-import pygame
-import os
-from config import SQUARE_SIZE, ASSETS_PATH, TOP_UI_HEIGHT, ABILITY_COLORS
-import copy
+
+# --- Codificación compacta ---
+# El tablero guarda cada casilla en un byte (ver Board.squares):
+#   bits 0-2: tipo de pieza (0 = casilla vacía), bit 3: pieza negra,
+#   bit 4: la pieza ya se movió, bits 5-6: habilidad activa.
+TYPE_MASK = 0x07
+BLACK_FLAG = 0x08
+MOVED_FLAG = 0x10
+ABILITY_MASK = 0x60
+PIECE_TYPES = (None, 'pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+TYPE_CODES = {name: code for code, name in enumerate(PIECE_TYPES) if name}
+ABILITY_CODES = {None: 0x00, 'omni_directional_pawn': 0x20, 'double_step_rook': 0x40}
+ABILITIES_BY_CODE = {code: ability for ability, code in ABILITY_CODES.items()}
 
 class Piece:
-    # Diccionario para almacenar las imágenes ya cargadas y evitar lecturas de disco repetidas.
-    # Es un atributo de clase, compartido por todas las instancias.
-    _images = {}
+    """
+    Clase base para todas las piezas de ajedrez.
+    Solo guarda datos de reglas; las imágenes se resuelven en la capa de dibujo (ui.py),
+    así que el núcleo de reglas no necesita Pygame. Usa __slots__ para ocupar poca memoria.
+    """
+    __slots__ = ('row', 'col', 'color', 'name', 'has_moved', 'ability', 'code')
 
-    """Clase base para todas las piezas de ajedrez."""
     def __init__(self, row, col, color, name):
         self.row = row
         self.col = col
@@ -18,40 +29,12 @@ class Piece:
         self.name = name
         self.has_moved = False
         self.ability = None # Atributo para almacenar la habilidad especial
-        self.image = None
-        self._load_image()
-        if self.image: # Asegúrate de que la imagen se haya cargado correctamente antes de obtener el rect.
-            self.rect = self.image.get_rect()
-            self.calculate_pixel_pos()
-
-    def _load_image(self):
-        """Carga la imagen de la pieza desde la carpeta de assets."""
-        image_key = f"{self.color}_{self.name}"
-        if image_key not in Piece._images:
-            # Si la imagen no ha sido cargada, la carga y la guarda en el diccionario.
-            image_path = os.path.join(ASSETS_PATH, f"{image_key}.png")
-            original_image = pygame.image.load(image_path)
-            Piece._images[image_key] = pygame.transform.scale(original_image, (SQUARE_SIZE, SQUARE_SIZE))
-        self.image = Piece._images[image_key] # Asigna la imagen cargada o ya existente
-        # Asegúrate de que self.image no sea None antes de llamar a get_rect()
-        if self.image:
-            self.rect = self.image.get_rect()
-    def calculate_pixel_pos(self):
-        """Calcula la posición en píxeles de la esquina superior izquierda de la casilla."""
-        self.rect.x = self.col * SQUARE_SIZE
-        self.rect.y = self.row * SQUARE_SIZE + TOP_UI_HEIGHT
-
-    def draw(self, screen):
-        """Dibuja la pieza en la pantalla."""
-        # Dibuja un aura si la pieza tiene una habilidad
-        if self.ability:
-            # Obtiene el color de la habilidad o usa el color por defecto si no se encuentra
-            aura_color = ABILITY_COLORS.get(self.ability, ABILITY_COLORS['default'])
-            aura_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            pygame.draw.circle(aura_surface, aura_color, (SQUARE_SIZE // 2, SQUARE_SIZE // 2), SQUARE_SIZE // 2)
-            screen.blit(aura_surface, self.rect.topleft)
-
-        screen.blit(self.image, self.rect)
+        # Tipo y color codificados (la parte fija del byte de la casilla)
+        self.code = TYPE_CODES[name] | (BLACK_FLAG if color == 'black' else 0)
+
+    def encode(self):
+        """Byte que representa a la pieza en Board.squares."""
+        return self.code | (MOVED_FLAG if self.has_moved else 0) | ABILITY_CODES[self.ability]
 
     def get_valid_moves(self, board):
         """
@@ -60,34 +43,11 @@ class Piece:
         """
         return []
 
-    def __deepcopy__(self, memo):
-        """
-        Implementación personalizada de deepcopy para evitar copiar superficies de Pygame.
-        Crea una nueva instancia de la pieza y copia solo los atributos lógicos.
-        """
-        # Evita la recursión infinita
-        if id(self) in memo:
-            return memo[id(self)]
-        
-        # Crea una nueva instancia de la misma clase sin llamar a __init__
-        cls = self.__class__
-        new_piece = cls.__new__(cls)
-        memo[id(self)] = new_piece
-
-        # Copia los atributos lógicos, pero no los de Pygame (image, rect)
-        for k, v in self.__dict__.items():
-            if k not in ['image', 'rect']:
-                setattr(new_piece, k, copy.deepcopy(v, memo))
-        
-        # Deja los atributos de Pygame como None en la copia
-        new_piece.image = None
-        new_piece.rect = None
-        
-        return new_piece
-
 # --- Clases para cada pieza ---
 
 class Pawn(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'pawn')
 
@@ -108,11 +68,15 @@ class Pawn(Piece):
         moves = []
         direction = -1 if self.color == 'white' else 1
 
+        # Un peón en la última fila no tiene casillas por delante
+        if not 0 <= self.row + direction < 8:
+            return moves
+
         # Movimiento de 1 casilla hacia adelante
-        if 0 <= self.row + direction < 8 and board[self.row + direction][self.col] is None:
+        if board[self.row + direction][self.col] is None:
             moves.append((self.row + direction, self.col))
             # Movimiento de 2 casillas en el primer turno
-            if not self.has_moved and board[self.row + 2 * direction][self.col] is None:
+            if not self.has_moved and 0 <= self.row + 2 * direction < 8 and board[self.row + 2 * direction][self.col] is None:
                 moves.append((self.row + 2 * direction, self.col))
 
         # Capturas en diagonal
@@ -124,6 +88,8 @@ class Pawn(Piece):
         return moves
 
 class Rook(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'rook')
 
@@ -146,6 +112,8 @@ class Rook(Piece):
         return moves        # Si la torre tiene la habilidad 'double_step_rook'
 
 class Knight(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'knight')
 
@@ -164,6 +132,8 @@ class Knight(Piece):
         return moves
 
 class Bishop(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'bishop')
 
@@ -186,6 +156,8 @@ class Bishop(Piece):
         return moves
 
 class Queen(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'queen')
 
@@ -196,6 +168,8 @@ class Queen(Piece):
         return rook_moves + bishop_moves
 
 class King(Piece):
+    __slots__ = ()
+
     def __init__(self, row, col, color):
         super().__init__(row, col, color, 'king')
 
@@ -211,4 +185,31 @@ class King(Piece):
                 target = board[r][c]
                 if target is None or target.color != self.color:
                     moves.append((r, c))
-        return moves
\ No newline at end of file
+        return moves
+
+PIECE_CLASSES = {
+    'pawn': Pawn, 'rook': Rook, 'knight': Knight,
+    'bishop': Bishop, 'queen': Queen, 'king': King
+}
+
+# Clase, color y nombre de cada combinación de tipo y color (los 4 bits bajos del byte)
+_PIECES_BY_CODE = {TYPE_CODES[name] | flag: (cls, color, name)
+                   for name, cls in PIECE_CLASSES.items()
+                   for flag, color in ((0, 'white'), (BLACK_FLAG, 'black'))}
+
+def piece_from_code(code, row, col):
+    """
+    Crea la pieza descrita por un byte de Board.squares en la casilla (row, col).
+    Rellena los atributos directamente en lugar de pasar por la cadena de __init__,
+    porque se usa para reconstruir tableros enteros (cargas, copias para el motor).
+    """
+    cls, color, name = _PIECES_BY_CODE[code & (TYPE_MASK | BLACK_FLAG)]
+    piece = cls.__new__(cls)
+    piece.row = row
+    piece.col = col
+    piece.color = color
+    piece.name = name
+    piece.has_moved = bool(code & MOVED_FLAG)
+    piece.ability = ABILITIES_BY_CODE[code & ABILITY_MASK]
+    piece.code = code & (TYPE_MASK | BLACK_FLAG)
+    return piece
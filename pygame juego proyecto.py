@@ -5,31 +5,99 @@
 # Descripción: Punto de entrada principal para el juego de Ajedrez con Habilidades.
 # Este archivo contiene el bucle principal del juego, maneja eventos y coordina
 # el dibujado en pantalla.
-
+#
+# Uso:
+#   python "pygame juego proyecto.py"
+#   python "pygame juego proyecto.py" --startup-profile   # tiempo de cada etapa del arranque
+#   python "pygame juego proyecto.py" --trace             # traza Chrome de tiempos al salir
+# Durante el juego, F3 muestra u oculta el panel de tiempos por fotograma.
+
+import time
+_PROCESS_START = time.perf_counter() # Referencia para --startup-profile (antes de importar pygame)
+
+import argparse
+import random
 import pygame
 import sys
 import config
 import os
-from ui import draw_board, create_palette_rects, draw_top_bar, draw_bottom_ui, draw_menu, draw_info_popup
+import threading
+from ui import (preload_piece_images, draw_board, draw_pieces, draw_square, draw_check_aura, square_topleft, create_palette_rects,
+                draw_top_bar, draw_bottom_ui, draw_menu, draw_info_popup, top_bar_rect, bottom_bar_rect,
+                black_timer_pos, white_timer_pos, timer_rect, get_font, render_text, draw_profiler_overlay,
+                DirtyRegions)
 from board import Board
 from game_logic import GameLogic
+from engine import SearchEngine, time_budget
+from video import VideoPlayer
+from instrumentation import Profiler
 import database
 
+# Traza de rendimiento por defecto de la opción --trace
+TRACE_FILE = os.path.join(config.BASE_DIR, 'chessmagic_trace.json')
+
+# Evento que publica el hilo del motor al terminar de pensar, para despertar el bucle principal
+ENGINE_DONE = pygame.event.custom_type()
+# Evento que envía el hilo escritor de la base de datos al terminar un guardado (atributo 'ok')
+SAVE_DONE = pygame.event.custom_type()
+
+class StartupProfile:
+    """Tiempo de cada etapa del arranque. Solo se imprime con la opción --startup-profile."""
+    def __init__(self, enabled=False, start=None):
+        self.enabled = enabled
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.stages = []
+
+    def mark(self, stage):
+        """Cierra la etapa 'stage': el tiempo transcurrido desde la marca anterior."""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def record(self, stage, elapsed):
+        """Etapa que termina en un hilo en segundo plano: se imprime en cuanto acaba."""
+        if self.enabled:
+            print(f"  {stage + ' (segundo plano)':<40}{elapsed * 1000:9.1f} ms")
+
+    def report(self, title):
+        """Imprime las etapas medidas desde el último informe."""
+        if not self.enabled:
+            return
+        print(f"--- {title}: {(self.last - self.start) * 1000:.1f} ms desde el inicio ---")
+        for stage, elapsed in self.stages:
+            print(f"  {stage:<40}{elapsed * 1000:9.1f} ms")
+        self.stages = []
+
 class Game:
     """Clase principal que encapsula la lógica y el estado del juego."""
-    def __init__(self):
-        """Inicializa el juego y sus componentes."""
-        pygame.init()
-        pygame.mixer.init() # Inicializar el mezclador de audio
+    def __init__(self, startup_profile=None, trace_path=None):
+        """
+        Inicializa lo imprescindible para mostrar el menú. El audio, el sonido de movimiento,
+        la base de datos y las imágenes de las piezas se cargan después del primer fotograma
+        (ver run_pending_load), y el vídeo del menú se decodifica en segundo plano.
+        """
+        self.profile = startup_profile or StartupProfile()
+        # Medición de tiempos por sección: activa con --trace o al mostrar el panel (F3)
+        self.trace_path = trace_path
+        self.profiler = Profiler(enabled=trace_path is not None)
+        self.show_profiler = False
+        self.profile.mark("importaciones")
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT)) # type: ignore
         pygame.display.set_caption("ChessMagic")
+        self.profile.mark("ventana")
         self.clock = pygame.time.Clock()
+        # Segundos máximos entre fotogramas en el estado actual (ver choose_frame_budget)
+        self.frame_budget = 1.0 / config.FPS
+        self.last_timer_update = None # Instante de la última actualización de los cronómetros
         self.running = True
         self.game_state = 'MENU' # Estados: MENU, PLAYING, INFO
         self.game_mode = None # Modos: 'indefinite', 'timed'
+        self.computer_color = None # Color que juega la computadora (None = dos jugadores)
         self.menu_buttons = {}
-        self.menu_video_frames = []
-        self.current_video_frame = 0
+        self.menu_video = None # Reproductor del vídeo de fondo del menú (video.VideoPlayer)
 
         # Atributos para el título animado del menú
         # Paleta de colores neón sin amarillos
@@ -59,76 +127,276 @@ class Game:
         # Lógica del juego
         self.board = Board()
         self.game_logic = GameLogic(self.board)
+        self.instrument_game_logic()
+        self.journal_game = None # Partida del diario de jugadas (database.JournalGame de start_journal)
+        self.journal_ply = 0
+        self.save_status = None # Aviso del último guardado en la barra superior
+        self.save_status_until = None # Instante en que se quita el aviso (None: mientras se guarda)
+        self.profile.mark("lógica del juego")
+
+        # Motor de la computadora: busca en un hilo aparte sobre una copia de la partida
+        self.engine = SearchEngine()
+        self.engine_thread = None
+        self.engine_result = None
+        self.engine_position = None
 
         # UI: Calcula los rectángulos de la paleta una sola vez
         self.swatch_rects = create_palette_rects()
         self.change_color_button_rect = None # Se calculará en el primer render
         self.action_buttons_rects = {} # Para guardar, cargar, reiniciar
-
-        # Inicializar la base de datos
-        database.init_db()
-
-        # Cargar recursos del menú (vídeo y música)
-        self.load_menu_resources()
-
-        # Cargar efectos de sonido del juego
-        try:
-            sound_path = os.path.join(config.SOUNDS_PATH, 'ficha-de-ajedrez.mp3')
-            self.move_sound = pygame.mixer.Sound(sound_path)
-            self.move_sound.set_volume(0.7)
-        except pygame.error as e:
-            print(f"Advertencia: No se pudo cargar el sonido de movimiento: {e}")
+        # Regiones de la pantalla de juego: solo se redibuja lo que cambió entre fotogramas
+        self.dirty_regions = DirtyRegions()
+        self.black_timer_rect = timer_rect(black_timer_pos())
+        self.white_timer_rect = timer_rect(white_timer_pos(self.swatch_rects))
+        self.profile.mark("interfaz")
+
+        # Vídeo de fondo del menú (hilo decodificador)
+        self.start_menu_video()
+        self.profile.mark("vídeo del menú")
+
+        # Recursos que se cargan tras el primer fotograma, uno por vuelta del bucle
+        self.first_frame_shown = False
+        self.pending_loads = [
+            ("audio y música del menú", self.load_menu_music),
+            ("sonido de movimiento", self.load_move_sound),
+            ("base de datos", database.init_db),
+            ("imágenes de las piezas (hilo)", self.start_piece_image_loader),
+        ]
+        self.piece_image_loader = None
 
     def run(self):
         """Inicia y mantiene el bucle principal del juego."""
         while self.running:
+            self.frame_budget = self.choose_frame_budget()
+            events = self.wait_for_events(self.frame_budget)
+            frame_start = time.perf_counter()
+            events = self.handle_debug_keys(events)
+            events = self.handle_save_events(events)
+            section = self.profiler.section
             if self.game_state == 'MENU':
-                self.handle_menu_events()
-                self.render_menu()
+                with section('handle_events'):
+                    self.handle_menu_events(events)
+                with section('render_menu'):
+                    self.render_menu()
             elif self.game_state == 'PLAYING':
-                self.update()
-                self.handle_game_events()
-                self.render_game()
+                with section('update'):
+                    self.update()
+                with section('handle_events'):
+                    self.handle_game_events(events)
+                with section('render_game'):
+                    self.render_game()
             elif self.game_state == 'INFO':
-                self.handle_info_events()
-                self.render_game(show_info=True)
-
-            self.clock.tick(config.FPS)
-
+                with section('handle_events'):
+                    self.handle_info_events(events)
+                with section('render_game'):
+                    self.render_game(show_info=True)
+            self.profiler.end_frame(frame_start)
+            if self.game_state != 'PLAYING':
+                self.last_timer_update = None # Los cronómetros solo corren durante la partida
+
+            if not self.first_frame_shown:
+                self.first_frame_shown = True
+                self.profile.mark("primer fotograma")
+                self.profile.report("Primer fotograma")
+            elif self.pending_loads:
+                self.run_pending_load()
+
+        if self.menu_video:
+            self.menu_video.stop()
+        if self.trace_path:
+            self.profiler.write_trace(self.trace_path)
+        database.close_db()
         pygame.quit()
         sys.exit()
 
-    def load_menu_resources(self):
-        """Carga la música de fondo y los fotogramas del vídeo para el menú."""
-        # Cargar música
+    def choose_frame_budget(self):
+        """
+        Tiempo máximo entre fotogramas según el estado: 1 / config.FPS mientras algo se anima
+        (vídeo del menú, cronómetro en marcha, carga del arranque) y config.IDLE_FRAME_TIME
+        si la pantalla está quieta; en ese caso el bucle duerme hasta que llegue un evento.
+        """
+        animating = bool(self.pending_loads)
+        if self.game_state == 'MENU':
+            animating = animating or bool(self.menu_video and self.menu_video.frame_files)
+        elif self.game_state == 'PLAYING':
+            animating = animating or (self.game_mode == 'timed' and not self.game_logic.game_over)
+        if animating:
+            return 1.0 / config.FPS
+        if self.save_status_until is not None:
+            # Despertar a tiempo para quitar el aviso de guardado
+            return max(1.0 / config.FPS, min(config.IDLE_FRAME_TIME, self.save_status_until - time.perf_counter()))
+        return config.IDLE_FRAME_TIME
+
+    def wait_for_events(self, budget):
+        """Espera al siguiente fotograma y devuelve los eventos pendientes."""
+        if budget <= 1.0 / config.FPS:
+            self.clock.tick(config.FPS) # Animación: ritmo fijo de fotogramas
+            return pygame.event.get()
+        events = pygame.event.get()
+        if not events:
+            # Pantalla quieta: dormir hasta un evento (clic, tecla, motor) o hasta agotar el plazo
+            event = pygame.event.wait(int(budget * 1000))
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        self.clock.tick()
+        return events
+
+    def handle_debug_keys(self, events):
+        """Atiende F3 (panel de tiempos) y devuelve el resto de eventos."""
+        remaining = []
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+                if self.show_profiler:
+                    self.profiler.enable()
+                elif not self.trace_path:
+                    self.profiler.disable()
+                self.dirty_regions.invalidate() # Repintar lo que tapaba el panel
+            else:
+                remaining.append(event)
+        return remaining
+
+    def handle_save_events(self, events):
+        """Atiende los avisos del hilo escritor (SAVE_DONE), caduca el aviso y devuelve el resto de eventos."""
+        remaining = []
+        for event in events:
+            if event.type == SAVE_DONE:
+                self.save_status = "Partida guardada" if event.ok else "Error al guardar"
+                self.save_status_until = time.perf_counter() + config.SAVE_STATUS_TIME
+            else:
+                remaining.append(event)
+        if self.save_status_until is not None and time.perf_counter() >= self.save_status_until:
+            self.save_status = None
+            self.save_status_until = None
+        return remaining
+
+    def save_game(self):
+        """Pide el guardado rápido sin esperar al disco; el hilo escritor avisa con SAVE_DONE al terminar."""
+        self.save_status = "Guardando..."
+        self.save_status_until = None
+        database.save_game_state(self.snapshot(),
+                                 callback=lambda ok: pygame.event.post(pygame.event.Event(SAVE_DONE, ok=ok)))
+
+    def load_game(self):
+        """Carga el guardado rápido y sigue la partida exactamente donde se guardó."""
+        snapshot = database.load_game_state()
+        if snapshot is not None:
+            self.restore(snapshot)
+            # La partida sigue desde otra posición: diario nuevo, enlazado con el de la guardada
+            self.start_journal(snapshot['ply'] or 0, snapshot['journal_game'])
+
+    def snapshot(self):
+        """
+        Estado completo de la partida como datos inmutables: el de la lógica (posición, habilidad,
+        doble paso, fin de partida y generador aleatorio) más el modo de juego, los relojes y
+        las jugadas hechas.
+        """
+        snapshot = self.game_logic.snapshot()
+        snapshot.update({
+            'game_mode': self.game_mode,
+            'computer_color': self.computer_color,
+            'white_time': self.white_time,
+            'black_time': self.black_time,
+            'timer_winner': self.timer_winner,
+            'ply': self.journal_ply,
+            'journal_game': self.journal_game,
+        })
+        return snapshot
+
+    def restore(self, snapshot):
+        """Vuelve al estado de un snapshot() sin crear un tablero ni una lógica nuevos."""
+        if snapshot['game_mode'] is not None: # Las partidas guardadas antiguas no tienen modo ni relojes
+            self.game_mode = snapshot['game_mode']
+            self.computer_color = snapshot['computer_color']
+            self.white_time = snapshot['white_time']
+            self.black_time = snapshot['black_time']
+            self.timer_winner = snapshot['timer_winner']
+        self.game_logic.restore(snapshot)
+        self.selected_piece = None
+        if self.game_logic.piece_with_ability is None and not self.game_logic.game_over:
+            self.game_logic.assign_random_ability()
+
+    def instrument_game_logic(self):
+        """Mide las llamadas a la lógica de la partida actual (no a la copia que usa el motor)."""
+        self.profiler.instrument(self.game_logic, 'is_valid_move', 'check_game_over', 'apply_move')
+
+    def draw_profiler_overlay(self):
+        """Dibuja el panel de tiempos si está visible y devuelve su rectángulo (o None)."""
+        if not self.show_profiler:
+            return None
+        p50, p95, p99 = self.profiler.percentiles()
+        lines = [
+            f"{self.game_state}: presupuesto {self.frame_budget * 1000:.1f} ms",
+            f"fotograma p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms",
+        ]
+        for name, mean in self.profiler.slowest_sections(6):
+            lines.append(f"  {name}: {mean:.3f} ms")
+        return draw_profiler_overlay(self.screen, lines)
+
+    def run_pending_load(self):
+        """Carga el siguiente recurso diferido del arranque."""
+        stage, load = self.pending_loads.pop(0)
+        load()
+        self.profile.mark(stage)
+        if not self.pending_loads:
+            self.profile.report("Arranque completo")
+
+    def finish_loading(self):
+        """Carga de inmediato los recursos diferidos que falten (al empezar una partida)."""
+        while self.pending_loads:
+            self.run_pending_load()
+        if self.piece_image_loader is not None:
+            self.piece_image_loader.join() # Las imágenes hacen falta para el primer fotograma de la partida
+            self.piece_image_loader = None
+
+    def start_piece_image_loader(self):
+        """Carga y escala las imágenes de las piezas en segundo plano (son imágenes grandes)."""
+        def load():
+            start = time.perf_counter()
+            preload_piece_images()
+            self.profile.record("imágenes de las piezas", time.perf_counter() - start)
+        self.piece_image_loader = threading.Thread(target=load, name="piece-images", daemon=True)
+        self.piece_image_loader.start()
+
+    def start_menu_video(self):
+        """Empieza a decodificar el vídeo de fondo del menú en segundo plano, ya escalado a la ventana."""
+        try:
+            self.menu_video = VideoPlayer(config.VIDEO_FRAMES_PATH, (config.WIDTH, config.HEIGHT),
+                                          config.MENU_VIDEO_FPS, config.MENU_VIDEO_BUFFER)
+            self.menu_video.start()
+        except FileNotFoundError:
+            print(f"Advertencia: No se encontró la carpeta de fotogramas de vídeo en {config.VIDEO_FRAMES_PATH}")
+
+    def load_menu_music(self):
+        """Inicializa el mezclador de audio y empieza la música del menú."""
         try:
-            music_path = os.path.join(config.SOUNDS_PATH, 'fondo musica menu.mp3')
-            pygame.mixer.music.load(music_path)
-            pygame.mixer.music.play(-1) # El -1 hace que se repita indefinidamente
-            pygame.mixer.music.set_volume(0.5) # Ajustar volumen (0.0 a 1.0)
+            pygame.mixer.init()
         except pygame.error as e:
-            print(f"Advertencia: No se pudo cargar la música del menú: {e}")
+            print(f"Advertencia: No se pudo inicializar el audio: {e}")
+            return
+        if self.game_state == 'MENU':
+            self.play_menu_music()
 
-        # Cargar fotogramas del vídeo
+    def load_move_sound(self):
+        """Carga el efecto de sonido de los movimientos."""
+        if not pygame.mixer.get_init():
+            return
         try:
-            # Obtener lista de archivos y ordenarla alfabéticamente para asegurar el orden correcto
-            frame_files = sorted(os.listdir(config.VIDEO_FRAMES_PATH))
-            for frame_file in frame_files:
-                if frame_file.endswith(('.png', '.jpg', '.jpeg')):
-                    frame_path = os.path.join(config.VIDEO_FRAMES_PATH, frame_file)
-                    self.menu_video_frames.append(pygame.image.load(frame_path).convert())
-        except FileNotFoundError:
-            print(f"Advertencia: No se encontró la carpeta de fotogramas de vídeo en {config.VIDEO_FRAMES_PATH}")
+            sound_path = os.path.join(config.SOUNDS_PATH, 'ficha-de-ajedrez.mp3')
+            self.move_sound = pygame.mixer.Sound(sound_path)
+            self.move_sound.set_volume(0.7)
+        except pygame.error as e:
+            print(f"Advertencia: No se pudo cargar el sonido de movimiento: {e}")
 
-    def handle_menu_events(self):
+    def handle_menu_events(self, events):
         """Gestiona eventos en la pantalla del menú."""
         # Lógica para cambiar el color del título cada segundo
-        current_time = pygame.time.get_ticks()
-        if current_time - self.last_color_change_time > 1000: # 1000 ms = 1 segundo
+        current_time = time.perf_counter()
+        if current_time - self.last_color_change_time > 1: # 1 segundo
             self.last_color_change_time = current_time
             self.current_title_color_index = (self.current_title_color_index + 1) % len(self.title_colors)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -136,12 +404,16 @@ class Game:
                     self.start_game('indefinite')
                 elif self.menu_buttons['timed'].collidepoint(event.pos):
                     self.start_game('timed')
+                elif self.menu_buttons['computer'].collidepoint(event.pos):
+                    self.start_game('timed', computer_color='black')
 
-    def handle_game_events(self):
+    def handle_game_events(self, events):
         """Procesa las entradas del usuario (ratón, teclado, etc.)."""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty_regions.invalidate() # La ventana se volvió a mostrar: repintar todo
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 # El botón de info debe funcionar incluso si el juego ha terminado
@@ -149,9 +421,7 @@ class Game:
                     self.game_state = 'INFO'
                     return
                 
-                # El resto de clics solo funcionan si el juego no ha terminado
-                if not self.game_logic.game_over:
-                    self.handle_mouse_click(event.pos)
+                # Con la partida terminada, handle_mouse_click solo atiende a los botones
                 self.handle_mouse_click(event.pos)
 
     def handle_mouse_click(self, pos):
@@ -172,14 +442,11 @@ class Game:
 
         # Comprobar si se hizo clic en los botones de acción (Guardar, Cargar, Reiniciar)
         if self.action_buttons_rects.get('guardar') and self.action_buttons_rects['guardar'].collidepoint(pos):
-            database.save_game_state(self.game_logic, self.board)
+            self.save_game()
             return
 
         if self.action_buttons_rects.get('cargar') and self.action_buttons_rects['cargar'].collidepoint(pos):
-            if database.load_game_state(self.game_logic, self.board):
-                self.selected_piece = None # Deseleccionar pieza tras cargar
-                # La habilidad se resetea dentro de load_game_state, pero la asignamos al nuevo turno
-                self.game_logic.assign_random_ability()
+            self.load_game()
             return
 
         if self.action_buttons_rects.get('reiniciar') and self.action_buttons_rects['reiniciar'].collidepoint(pos):
@@ -189,7 +456,8 @@ class Game:
         if self.action_buttons_rects.get('menú') and self.action_buttons_rects['menú'].collidepoint(pos):
             self.game_state = 'MENU'
             # Detener la música del juego y empezar la del menú
-            pygame.mixer.music.fadeout(500)
+            if pygame.mixer.get_init():
+                pygame.mixer.music.fadeout(500)
             # Reiniciar la música del menú si no está sonando
             self.play_menu_music()
             return
@@ -209,6 +477,10 @@ class Game:
                 print("Error al cambiar el color del tablero.")
             return
 
+        # Mientras piensa la computadora el tablero no acepta clics
+        if self.game_logic.turn == self.computer_color:
+            return
+
         # Si no se hizo clic en la paleta, comprobar si fue en el tablero
         board_rect = pygame.Rect(0, config.TOP_UI_HEIGHT, config.BOARD_WIDTH, config.BOARD_HEIGHT)
         if board_rect.collidepoint(pos):
@@ -227,31 +499,17 @@ class Game:
 
                 # 2. Intentar mover la pieza a la nueva casilla (vacía o con enemigo).
                 if self.game_logic.is_valid_move(self.selected_piece, row, col): # (Aquí iría la validación de movimiento de la pieza)
-                    is_double_step_rook = self.selected_piece.ability == 'double_step_rook'
-                    
-                    # Si es el primer movimiento de la torre de doble paso
-                    if is_double_step_rook and self.game_logic.double_step_rook_moved is None:
-                        self.game_logic.double_step_rook_moved = self.selected_piece
-                        self.board.move_piece(self.selected_piece, row, col, keep_ability=True)
-                        if self.move_sound:
-                            self.move_sound.play()
-                        # No cambiamos de turno y no deseleccionamos la pieza.
-                        # El jugador debe mover la torre de nuevo.
-                        return
+                    record = self.game_logic.apply_move(self.selected_piece, row, col)
+                    self.record_move(record)
 
-                    # Para cualquier otro movimiento (incluido el segundo de la torre)
-                    self.board.move_piece(self.selected_piece, row, col)
-                    
                     # Reproducir sonido de movimiento
                     if self.move_sound:
                         self.move_sound.play()
-                    
-                    # Comprobar si el movimiento resultó en la captura del rey
-                    self.game_logic.check_king_capture(self.selected_piece.color)
 
-                    # Si el juego no ha terminado por captura, pasar al siguiente turno
-                    if not self.game_logic.game_over:
-                        self.game_logic.next_turn()
+                    # Tras el primer paso de la torre de doble paso no deseleccionamos la pieza.
+                    # El jugador debe mover la torre de nuevo.
+                    if record['double_step']:
+                        return
                     self.selected_piece = None # Deseleccionar después del movimiento final
                 else:
                     # Si el movimiento no es válido, deseleccionar la pieza
@@ -265,13 +523,11 @@ class Game:
         """Gestiona los clics después de que el juego ha terminado."""
         # Comprobar si se hizo clic en los botones de acción (Guardar, Cargar, Reiniciar)
         if self.action_buttons_rects.get('guardar') and self.action_buttons_rects['guardar'].collidepoint(pos):
-            database.save_game_state(self.game_logic, self.board)
+            self.save_game()
             return
 
         if self.action_buttons_rects.get('cargar') and self.action_buttons_rects['cargar'].collidepoint(pos):
-            if database.load_game_state(self.game_logic, self.board):
-                self.selected_piece = None # Deseleccionar pieza tras cargar
-                self.game_logic.assign_random_ability()
+            self.load_game()
             return
 
         if self.action_buttons_rects.get('reiniciar') and self.action_buttons_rects['reiniciar'].collidepoint(pos):
@@ -281,7 +537,8 @@ class Game:
         if self.action_buttons_rects.get('menú') and self.action_buttons_rects['menú'].collidepoint(pos):
             self.game_state = 'MENU'
             # Detener la música del juego y empezar la del menú
-            pygame.mixer.music.fadeout(500)
+            if pygame.mixer.get_init():
+                pygame.mixer.music.fadeout(500)
             # Reiniciar la música del menú si no está sonando
             self.play_menu_music()
             return
@@ -306,11 +563,13 @@ class Game:
         except pygame.error as e:
             print(f"Advertencia: No se pudo reiniciar la música del menú: {e}")
 
-    def handle_info_events(self):
+    def handle_info_events(self, events):
         """Gestiona eventos mientras se muestra el pop-up de información."""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty_regions.invalidate()
             # Si se hace clic o se presiona una tecla, se cierra el pop-up
             if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN:
                 self.game_state = 'PLAYING'
@@ -320,10 +579,12 @@ class Game:
 
     def update(self):
         """Actualiza el estado del juego (lógica de piezas, turnos, etc.)."""
-        if self.game_mode == 'timed' and not self.game_logic.game_over:
-            # Obtener el tiempo transcurrido en segundos
-            delta_time = self.clock.get_time() / 1000.0
+        # Tiempo real transcurrido desde la última actualización (el bucle puede haber dormido)
+        now = time.perf_counter()
+        delta_time = now - self.last_timer_update if self.last_timer_update is not None else 0.0
+        self.last_timer_update = now
 
+        if self.game_mode == 'timed' and not self.game_logic.game_over:
             if self.game_logic.turn == 'white':
                 self.white_time -= delta_time
                 if self.white_time <= 0:
@@ -337,16 +598,64 @@ class Game:
                     self.game_logic.game_over = True
                     self.timer_winner = 'White' # Ganan las blancas
 
-    def start_game(self, mode):
+        self.update_computer()
+
+    def update_computer(self):
+        """Lanza la búsqueda de la computadora en segundo plano y aplica su jugada al terminar."""
+        logic = self.game_logic
+        if self.computer_color is None or logic.game_over or logic.turn != self.computer_color:
+            return
+
+        if self.engine_thread is None:
+            remaining = None
+            if self.game_mode == 'timed':
+                remaining = self.white_time if self.computer_color == 'white' else self.black_time
+            self.engine_result = None
+            self.engine_position = logic.position_hash()
+            self.engine_thread = threading.Thread(
+                target=self.run_engine, args=(logic.copy_for_search(), time_budget(remaining)), daemon=True)
+            self.engine_thread.start()
+            return
+
+        if self.engine_result is None and self.engine_thread.is_alive():
+            return # El reloj sigue corriendo para la computadora mientras piensa
+        self.engine_thread = None
+
+        # Descartar el resultado si la partida cambió (reinicio o carga) mientras pensaba
+        if self.engine_result is None or logic.position_hash() != self.engine_position:
+            return
+        if self.engine_result.move is None:
+            # Solo ocurre si la torre de doble paso no tiene segundo movimiento: se pasa el turno
+            self.record_move(logic.pass_turn())
+            return
+        from_row, from_col, to_row, to_col = self.engine_result.move
+        piece = self.board.board[from_row][from_col]
+        if logic.is_valid_move(piece, to_row, to_col):
+            self.record_move(logic.apply_move(piece, to_row, to_col))
+            if self.move_sound:
+                self.move_sound.play()
+
+    def run_engine(self, search_logic, budget):
+        """Cuerpo del hilo del motor. Con el perfilador activo, la búsqueda cuenta como sección 'engine.search'."""
+        start = time.perf_counter()
+        self.engine_result = self.engine.search(search_logic, budget)
+        if self.profiler.enabled:
+            self.profiler.record('engine.search', start, time.perf_counter())
+        pygame.event.post(pygame.event.Event(ENGINE_DONE)) # Despierta el bucle si está dormido
+
+    def start_game(self, mode, computer_color=None):
         """Configura e inicia una nueva partida en el modo seleccionado."""
+        self.finish_loading() # Audio, sonido y base de datos listos antes de jugar
+
         # Detener la música del menú al iniciar la partida
-        if pygame.mixer.music.get_busy():
+        if pygame.mixer.get_init() and pygame.mixer.music.get_busy():
             pygame.mixer.music.fadeout(500) # Desvanecer en 500 ms
 
         # Iniciar la música del juego
         self.play_game_music()
 
         self.game_mode = mode
+        self.computer_color = computer_color
         self.reset_game()
         self.game_state = 'PLAYING'
 
@@ -354,76 +663,171 @@ class Game:
         """Reinicia el juego a su estado inicial."""
         print("Reiniciando partida...")
         self.board = Board()
-        self.game_logic = GameLogic(self.board)
+        # Generador propio de la partida (su estado va en los guardados); la semilla sale del
+        # generador global, así que random.seed() sigue haciendo reproducible una partida
+        self.game_logic = GameLogic(self.board, rng=random.Random(random.getrandbits(64)))
+        self.instrument_game_logic()
         self.white_time = config.GAME_TIME_SECONDS
         self.black_time = config.GAME_TIME_SECONDS
         self.timer_winner = None
         self.selected_piece = None
         self.game_logic.assign_random_ability() # Asignar habilidad para el primer turno
         self.game_logic.game_over = False
+        self.start_journal()
+
+    def start_journal(self, ply=0, parent=None):
+        """
+        Abre el diario de jugadas de la partida que empieza, con su posición actual como punto
+        de partida; 'ply' son las jugadas que ya se llevan y 'parent', la partida del diario de
+        la que sigue (al seguir una partida cargada).
+        """
+        self.journal_game = database.start_journal(self.game_mode, self.game_logic, ply, *self.journal_clocks(),
+                                                   parent_id=parent)
+        self.journal_ply = ply
+
+    def journal_clocks(self):
+        """Tiempo restante de blancas y negras para el diario (None sin cronómetro)."""
+        if self.game_mode != 'timed':
+            return None, None
+        return self.white_time, self.black_time
+
+    def record_move(self, record):
+        """
+        Añade la jugada al diario (una inserción pequeña) y, cada JOURNAL_CHECKPOINT_INTERVAL
+        jugadas, guarda un punto de control con la posición completa.
+        """
+        self.journal_ply += 1
+        clock = self.journal_clocks()[0 if record['color'] == 'white' else 1]
+        database.append_move(self.journal_game, self.journal_ply, record, clock, self.game_logic.position_hash())
+        if self.journal_ply % config.JOURNAL_CHECKPOINT_INTERVAL == 0:
+            database.save_checkpoint(self.journal_game, self.journal_ply, self.game_logic, *self.journal_clocks())
 
     def render_menu(self):
         """Dibuja la pantalla del menú principal."""
         # Dibuja el fondo (vídeo o color sólido)
-        if self.menu_video_frames:
-            # Escalar el fotograma al tamaño de la pantalla para que se adapte
-            frame = pygame.transform.scale(self.menu_video_frames[self.current_video_frame], (config.WIDTH, config.HEIGHT))
-            self.screen.blit(frame, (0, 0))
-            
-            # Avanzar al siguiente fotograma para la animación
-            self.current_video_frame += 1
-            if self.current_video_frame >= len(self.menu_video_frames):
-                self.current_video_frame = 0 # Reiniciar para crear un bucle
+        frame = self.menu_video.current_frame() if self.menu_video else None
+        if frame is not None:
+            self.screen.blit(frame, (0, 0)) # El fotograma ya viene escalado a la pantalla
         else:
             self.screen.fill(config.UI_BG) # Color de fondo si no hay vídeo
 
         # Dibuja los botones del menú encima del fondo
         current_title_color = self.title_colors[self.current_title_color_index]
         self.menu_buttons = draw_menu(self.screen, current_title_color)
-        pygame.display.flip()
+        self.draw_profiler_overlay()
+        with self.profiler.section('display.flip'):
+            pygame.display.flip()
+        self.dirty_regions.invalidate() # Al volver a la partida se repinta entera
 
     def render_game(self, show_info=False):
-        """Dibuja todos los elementos del juego en la pantalla."""
+        """
+        Dibuja la partida. Solo se redibujan y se envían a la pantalla las regiones que
+        cambiaron desde el fotograma anterior (casillas, barras y cronómetros); la pantalla
+        completa se repinta al entrar en la partida y al mostrar u ocultar un aviso.
+        """
+        logic = self.game_logic
+        dirty = self.dirty_regions
+
+        check_square = None
+        with self.profiler.section('is_in_check'):
+            in_check = logic.legal_moves.side_in_check()
+        if in_check:
+            king = logic.find_king(logic.turn)
+            if king:
+                check_square = king.row * 8 + king.col
+        timed = self.game_mode == 'timed'
+        holder = logic.piece_with_ability
+        message = self.game_over_message()
+
+        # Regiones de las barras que cambiaron: (rectángulo, barra a la que pertenecen)
+        bar_regions = []
+        if dirty.changed('top_bar', (logic.turn, holder.ability if holder else None, holder.name if holder else None, self.save_status)):
+            bar_regions.append((top_bar_rect(), 'top'))
+        if dirty.changed('black_timer', int(self.black_time) if timed else None):
+            bar_regions.append((self.black_timer_rect, 'top'))
+        if dirty.changed('bottom_bar', self.selected_color):
+            bar_regions.append((bottom_bar_rect(), 'bottom'))
+        if dirty.changed('white_timer', int(self.white_time) if timed else None):
+            bar_regions.append((self.white_timer_rect, 'bottom'))
+
+        # Casillas que cambiaron: pieza, habilidad, aura de jaque o colores del tablero
+        colors = (self.board_colors["light"], self.board_colors["dark"])
+        squares = bytes(self.board.squares)
+        previous = dirty.signatures.get('board')
+        dirty_squares = []
+        if dirty.changed('board', (squares, check_square, colors)) and previous is not None:
+            old_squares, old_check, old_colors = previous
+            if old_colors != colors:
+                dirty_squares = range(64)
+            else:
+                dirty_squares = {sq for sq in range(64) if old_squares[sq] != squares[sq]}
+                dirty_squares.update(sq for sq in (old_check, check_square) if sq is not None)
+
+        # Con un aviso encima (fin de partida o info) cualquier cambio obliga a repintar todo
+        overlay_changed = dirty.changed('overlay', (message, show_info))
+        if overlay_changed or ((message or show_info) and (bar_regions or dirty_squares)):
+            dirty.full_redraw = True
+
+        if dirty.full_redraw:
+            self.render_full_game(message, check_square, show_info)
+            dirty.full_redraw = False
+            return
+
+        section = self.profiler.section
+        rects = []
+        for rect, bar in bar_regions:
+            self.screen.set_clip(rect)
+            if bar == 'top':
+                with section('draw_top_bar'):
+                    draw_top_bar(self.screen, logic, self.game_mode, self.black_time, self.save_status)
+            else:
+                with section('draw_bottom_ui'):
+                    self.action_buttons_rects = draw_bottom_ui(self.screen, self.selected_color, self.swatch_rects, self.game_mode, self.white_time)
+            rects.append(rect)
+        self.screen.set_clip(None)
+
+        with section('draw_squares'):
+            for sq in dirty_squares:
+                row, col = divmod(sq, 8)
+                draw_square(self.screen, self.board, row, col, self.board_colors, sq == check_square)
+                rects.append(pygame.Rect(square_topleft(row, col), (config.SQUARE_SIZE, config.SQUARE_SIZE)))
+
+        overlay_rect = self.draw_profiler_overlay()
+        if overlay_rect:
+            rects.append(overlay_rect)
+        if rects:
+            with section('display.update'):
+                pygame.display.update(rects) # Solo se envían las regiones redibujadas
+
+    def render_full_game(self, message, check_square, show_info):
+        """Dibuja todos los elementos del juego y actualiza la pantalla completa."""
+        section = self.profiler.section
         self.screen.fill(config.BLACK) # Limpia la pantalla
-        
+
         # Dibuja los componentes de la UI
-        draw_top_bar(self.screen, self.game_logic, self.game_mode, self.black_time)
-        draw_board(self.screen, self.board_colors)
+        with section('draw_top_bar'):
+            draw_top_bar(self.screen, self.game_logic, self.game_mode, self.black_time, self.save_status)
+        with section('draw_board'):
+            draw_board(self.screen, self.board_colors)
 
         # Dibuja un aviso si el rey del turno actual está en jaque
-        if self.game_logic.is_in_check(self.game_logic.turn):
-            king = self.game_logic.find_king(self.game_logic.turn)
-            if king:
-                # Crea una superficie para el aura de jaque
-                check_aura_color = (255, 0, 0, 120) # Rojo semi-transparente
-                aura_surface = pygame.Surface((config.SQUARE_SIZE, config.SQUARE_SIZE), pygame.SRCALPHA)
-                pygame.draw.circle(aura_surface, check_aura_color, (config.SQUARE_SIZE // 2, config.SQUARE_SIZE // 2), config.SQUARE_SIZE // 2)
-                
-                # Dibuja el aura en la posición del rey
-                self.screen.blit(aura_surface, king.rect.topleft)
+        if check_square is not None:
+            draw_check_aura(self.screen, *divmod(check_square, 8))
 
-        self.board.draw_pieces(self.screen) # Dibuja las piezas sobre el tablero
+        with section('draw_pieces'):
+            draw_pieces(self.screen, self.board) # Dibuja las piezas sobre el tablero
         # Dibuja toda la UI inferior (paleta, iconos, etc.) y guarda sus rects
-        self.action_buttons_rects = draw_bottom_ui(self.screen, self.selected_color, self.swatch_rects, self.game_mode, self.white_time)
-        
-        # Si el juego ha terminado, mostrar el mensaje correspondiente
-        if self.game_logic.game_over:
-            message = ""
-            if self.timer_winner:
-                message = f"Tiempo agotado! Ganan las {self.timer_winner}"
-            elif self.game_logic.is_in_check(self.game_logic.turn):
-                winner = 'Black' if self.game_logic.turn == 'white' else 'White'
-                message = f"Jaque Mate! Ganan las {winner}"
-            else:
-                message = "Ahogado! Es un empate."
+        with section('draw_bottom_ui'):
+            self.action_buttons_rects = draw_bottom_ui(self.screen, self.selected_color, self.swatch_rects, self.game_mode, self.white_time)
 
+        # Si el juego ha terminado, mostrar el mensaje correspondiente
+        if message:
             # Crear una superficie semi-transparente para el fondo del texto
             overlay = pygame.Surface((config.WIDTH, config.HEIGHT), pygame.SRCALPHA)
             overlay.fill((0, 0, 0, 150)) # Negro con 150 de alpha
             self.screen.blit(overlay, (0, 0))
 
-            font = pygame.font.SysFont(None, 50)
-            text_surface = font.render(message, True, config.WHITE)
+            text_surface = render_text(get_font(None, 50), message, config.WHITE)
             text_rect = text_surface.get_rect(center=(config.WIDTH / 2, config.HEIGHT / 2))
             self.screen.blit(text_surface, text_rect)
 
@@ -431,11 +835,29 @@ class Game:
         if show_info:
             draw_info_popup(self.screen)
 
-        pygame.display.flip() # Actualiza la pantalla completa
+        self.draw_profiler_overlay()
+        with section('display.flip'):
+            pygame.display.flip() # Actualiza la pantalla completa
+
+    def game_over_message(self):
+        """Mensaje de fin de partida, o None si la partida sigue."""
+        if not self.game_logic.game_over:
+            return None
+        if self.timer_winner:
+            return f"Tiempo agotado! Ganan las {self.timer_winner}"
+        if self.game_logic.legal_moves.side_in_check():
+            winner = 'Black' if self.game_logic.turn == 'white' else 'White'
+            return f"Jaque Mate! Ganan las {winner}"
+        return "Ahogado! Es un empate."
 
 def main():
     """Función principal que crea una instancia del juego y la ejecuta."""
-    game = Game()
+    parser = argparse.ArgumentParser(description="ChessMagic: ajedrez con habilidades.")
+    parser.add_argument('--startup-profile', action='store_true', help="mostrar el tiempo de cada etapa del arranque")
+    parser.add_argument('--trace', nargs='?', const=TRACE_FILE, metavar='ARCHIVO',
+                        help=f"medir tiempos desde el inicio y guardar una traza Chrome al salir (por defecto {TRACE_FILE})")
+    args = parser.parse_args()
+    game = Game(StartupProfile(args.startup_profile, _PROCESS_START), trace_path=args.trace)
     game.run()
 
 if __name__ == "__main__":
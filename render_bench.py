@@ -0,0 +1,213 @@
+# Archivo: render_bench.py
+# Descripción: Banco de pruebas del dibujado sin pantalla. Usa el controlador de vídeo 'dummy'
+# de SDL, construye un Game, reproduce una secuencia de clics con handle_mouse_click y dibuja
+# N fotogramas en cada estado (menú con vídeo, partida, partida quieta, info y fin de partida).
+# Imprime un JSON con fotogramas/segundo, percentiles y asignaciones de memoria por fotograma.
+#
+# Cada estado se mide dos veces: 'incremental' (solo se redibuja lo que cambió, como en el
+# juego) y 'full_redraw' (se repinta la pantalla entera en cada fotograma). En los estados
+# quietos la medida incremental es casi solo la comprobación de DirtyRegions; la completa es
+# la que muestra el coste real del dibujado de ui.py y render_game.
+#
+# Uso:
+#   python render_bench.py                         # 300 fotogramas por estado y modo
+#   python render_bench.py --frames 1000 --output render_bench.json
+#   python render_bench.py --full-redraw           # solo la medida con repintado completo
+#
+# Las asignaciones son del montón de Python (tracemalloc y sys.getallocatedblocks), medidas en
+# una segunda pasada para no falsear los tiempos: 'alloc_peak_kb' es la memoria temporal que
+# pide un fotograma y 'alloc_blocks' los bloques que siguen vivos al terminarlo. Los píxeles de
+# las superficies de pygame no pasan por el montón de Python y no se cuentan.
+import os
+os.environ['SDL_VIDEODRIVER'] = 'dummy' # Antes de importar pygame
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1') # stdout queda solo para el JSON
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pygame
+import config
+import database
+
+MAIN_FILE = os.path.join(config.BASE_DIR, 'pygame juego proyecto.py')
+STATES = ('MENU', 'PLAYING', 'PLAYING_IDLE', 'INFO', 'GAME_OVER')
+
+
+def load_game_class():
+    """Importa la clase Game del punto de entrada (su nombre de archivo tiene espacios)."""
+    spec = importlib.util.spec_from_file_location('chessmagic_main', MAIN_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Game
+
+
+def click(game, pos):
+    """Clic de ratón en la posición dada, tal como lo recibiría el bucle del juego."""
+    game.handle_mouse_click(pos)
+
+
+def square_center(row, col):
+    return (col * config.SQUARE_SIZE + config.SQUARE_SIZE // 2,
+            config.TOP_UI_HEIGHT + row * config.SQUARE_SIZE + config.SQUARE_SIZE // 2)
+
+
+def scripted_clicks(game):
+    """
+    Clics de la siguiente jugada: seleccionar una pieza y pulsar su destino. La jugada es la
+    primera legal en orden de casillas, así que la secuencia es la misma en cada ejecución.
+    """
+    logic = game.game_logic
+    if not logic.legal_moves.has_moves():
+        return []
+    piece = min(logic.legal_moves.moves, key=lambda p: (p.row, p.col))
+    row, col = min(logic.legal_moves.moves[piece])
+    if game.selected_piece is piece:
+        return [square_center(row, col)] # Segundo paso de la pieza de doble paso
+    return [square_center(piece.row, piece.col), square_center(row, col)]
+
+
+class StateRunner:
+    """Prepara cada estado y dibuja un fotograma de él."""
+    def __init__(self, game, full_redraw):
+        self.game = game
+        self.full_redraw = full_redraw
+        self.pending_clicks = []
+
+    def setup(self, state):
+        game = self.game
+        if state == 'MENU':
+            game.game_state = 'MENU'
+            # Esperar (como mucho 2 s) a que el hilo del vídeo tenga fotogramas listos
+            deadline = time.perf_counter() + 2.0
+            while game.menu_video and game.menu_video.current_frame() is None and time.perf_counter() < deadline:
+                time.sleep(0.01)
+        elif state in ('PLAYING', 'PLAYING_IDLE'):
+            random.seed(0) # Habilidades reproducibles
+            game.start_game('indefinite')
+        elif state == 'INFO':
+            if game.game_state != 'PLAYING':
+                game.start_game('indefinite')
+                game.render_game() # Calcula los rectángulos de los botones
+            click(game, game.action_buttons_rects['info'].center)
+        elif state == 'GAME_OVER':
+            game.start_game('timed')
+            game.render_game()
+            game.white_time = 0.0 # El reloj de las blancas se agota en la siguiente actualización
+            game.update()
+
+    def frame(self, state):
+        game = self.game
+        if self.full_redraw:
+            game.dirty_regions.invalidate()
+        if state == 'MENU':
+            game.handle_menu_events([])
+            game.render_menu()
+        elif state == 'PLAYING':
+            # Un clic por fotograma: se alternan selecciones y movimientos
+            if not self.pending_clicks:
+                if game.game_logic.game_over:
+                    game.reset_game()
+                self.pending_clicks = scripted_clicks(game)
+            if self.pending_clicks:
+                click(game, self.pending_clicks.pop(0))
+            game.render_game()
+        elif state == 'INFO':
+            game.render_game(show_info=True)
+        else:
+            game.render_game()
+
+
+def measure(runner, state, frames):
+    """Mide 'frames' fotogramas de un estado; las asignaciones, en una segunda pasada."""
+    runner.setup(state)
+    runner.frame(state) # El primer fotograma (repintado completo) no se cuenta
+
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        runner.frame(state)
+        times.append(time.perf_counter() - start)
+
+    alloc_frames = min(frames, 100)
+    tracemalloc.start()
+    peak_bytes = 0
+    blocks = 0
+    for _ in range(alloc_frames):
+        before_blocks = sys.getallocatedblocks()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        runner.frame(state)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_bytes += peak - before
+        blocks += sys.getallocatedblocks() - before_blocks
+    tracemalloc.stop()
+
+    times.sort()
+    total = sum(times)
+    last = len(times) - 1
+    return {
+        'frames': frames,
+        'fps': frames / total if total > 0 else 0.0,
+        'mean_ms': total / frames * 1000,
+        'p50_ms': times[round(last * 0.50)] * 1000,
+        'p95_ms': times[round(last * 0.95)] * 1000,
+        'p99_ms': times[round(last * 0.99)] * 1000,
+        'alloc_peak_kb': peak_bytes / alloc_frames / 1024,
+        'alloc_blocks': blocks / alloc_frames,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas del dibujado de ChessMagic sin pantalla.")
+    parser.add_argument('--frames', type=int, default=300, help="fotogramas por estado (por defecto 300)")
+    parser.add_argument('--states', nargs='+', default=list(STATES), choices=STATES, help="estados a medir")
+    parser.add_argument('--full-redraw', action='store_true', help="medir solo con la pantalla completa repintada en cada fotograma")
+    parser.add_argument('--output', help="escribir también el JSON en este archivo")
+    args = parser.parse_args(argv)
+
+    # Las partidas del banco de pruebas van a una base de datos temporal, no a la del jugador
+    db_dir = tempfile.TemporaryDirectory()
+    database.DB_FILE = os.path.join(db_dir.name, 'render_bench.db')
+
+    # Los mensajes del juego van a stderr: stdout queda solo para el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        Game = load_game_class()
+        game = Game()
+        game.finish_loading()
+        modes = ('full_redraw',) if args.full_redraw else ('incremental', 'full_redraw')
+        results = {}
+        for state in args.states:
+            results[state] = {}
+            for mode in modes:
+                runner = StateRunner(game, mode == 'full_redraw')
+                results[state][mode] = measure(runner, state, args.frames)
+        if game.menu_video:
+            game.menu_video.stop()
+        database.close_db()
+        pygame.quit()
+    db_dir.cleanup()
+
+    report = {
+        'benchmark': 'render',
+        'video_driver': os.environ['SDL_VIDEODRIVER'],
+        'pygame': pygame.version.ver,
+        'states': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# Archivo: selfplay.py
+# Descripción: Simulador de partidas sin ventana para medir el equilibrio de las habilidades.
+# Juega N partidas repartidas entre todos los núcleos con un pool de multiprocessing y
+# escribe una línea JSON por partida (ganador, duración, habilidades asignadas y usadas,
+# jaques y forma de terminar) a medida que van acabando.
+#
+# Uso:
+#   python selfplay.py --games 1000                      # jugadas aleatorias, todos los núcleos
+#   python selfplay.py --games 200 --policy engine --move-time 0.05
+#   python selfplay.py --games 1000 --workers 4 --seed 7 --output resultados.jsonl
+#
+# Cada partida usa su propio random.Random con semilla 'seed + número de partida', de modo que
+# los resultados son reproducibles sin importar cuántos procesos se usen ni en qué orden acaben.
+# Resultados posibles: 'checkmate', 'stalemate', 'king_capture' y 'timeout' (se alcanzó el
+# límite de medios movimientos; en las simulaciones no hay cronómetro).
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import config
+from board import Board
+from game_logic import GameLogic, POSSIBLE_ABILITIES
+from engine import SearchEngine
+
+OUTPUT_FILE = os.path.join(config.BASE_DIR, 'selfplay_results.jsonl')
+
+# Parámetros de la partida en curso de cada proceso (los fija _init_worker)
+_settings = {}
+
+
+def _init_worker(settings):
+    """Inicializador del pool: guarda los parámetros comunes en cada proceso."""
+    _settings.update(settings)
+
+
+def _random_move(logic, rng):
+    """Jugada legal elegida al azar entre todas las del jugador en turno."""
+    moves = [(piece, move) for piece, piece_moves in logic.legal_moves.moves.items() for move in piece_moves]
+    piece, (row, col) = rng.choice(moves)
+    return piece, row, col
+
+
+def _engine_move(logic, engine, move_time):
+    """Jugada del motor de búsqueda, o None si no encuentra ninguna."""
+    result = engine.search(logic.copy_for_search(), move_time)
+    if result.move is None:
+        return None
+    from_row, from_col, to_row, to_col = result.move
+    return logic.board.board[from_row][from_col], to_row, to_col
+
+
+def play_game(index):
+    """Juega una partida completa y devuelve su resumen como diccionario."""
+    seed = _settings['seed'] + index
+    rng = random.Random(seed)
+    logic = GameLogic(Board(), rng=rng, verbose=False)
+    logic.use_bitboards = _settings['generator'] == 'bitboard'
+    engine = SearchEngine(max_depth=_settings['depth'], verbose=False) if _settings['policy'] == 'engine' else None
+
+    assigned = {ability: 0 for ability in POSSIBLE_ABILITIES}
+    fired = {ability: 0 for ability in POSSIBLE_ABILITIES}
+    checks = 0
+    plies = 0
+    outcome = 'timeout'
+    winner = None
+    last_holder = None
+
+    logic.assign_random_ability() # Habilidad del primer turno, como en Game.reset_game
+    while plies < _settings['max_plies']:
+        holder = logic.piece_with_ability
+        if holder is not None and holder is not last_holder:
+            assigned[holder.ability] += 1
+            last_holder = holder
+
+        if logic.game_over:
+            if logic.legal_moves.side_in_check():
+                outcome = 'checkmate'
+                winner = 'black' if logic.turn == 'white' else 'white'
+            else:
+                outcome = 'stalemate'
+            break
+        if not logic.legal_moves.has_moves():
+            # Solo ocurre si la pieza de doble paso no tiene segundo movimiento: se pasa el turno
+            logic.next_turn()
+            continue
+        if logic.double_step_rook_moved is None and logic.legal_moves.side_in_check():
+            checks += 1
+
+        if engine is not None:
+            move = _engine_move(logic, engine, _settings['move_time'])
+            if move is None:
+                logic.next_turn()
+                continue
+        else:
+            move = _random_move(logic, rng)
+        piece, row, col = move
+        record = logic.apply_move(piece, row, col)
+        plies += 1
+
+        if record['double_step']:
+            fired['double_step_rook'] += 1
+        elif record['ability'] == 'omni_directional_pawn' and record['piece'] == 'pawn' and _omni_only(record):
+            fired['omni_directional_pawn'] += 1
+        if record['captured'] == 'king':
+            outcome = 'king_capture'
+            winner = record['color']
+            break
+
+    return {
+        'game': index,
+        'seed': seed,
+        'winner': winner,
+        'outcome': outcome,
+        'plies': plies,
+        'checks': checks,
+        'abilities_assigned': assigned,
+        'abilities_fired': fired,
+    }
+
+
+def _omni_only(record):
+    """
+    Si la jugada del peón con 'omni_directional_pawn' solo es posible gracias a la habilidad:
+    un peón normal avanza una casilla a una casilla vacía o captura en diagonal hacia delante.
+    """
+    (from_row, from_col), (to_row, to_col) = record['from'], record['to']
+    forward = -1 if record['color'] == 'white' else 1
+    if to_row - from_row != forward:
+        return True # Lateral o hacia atrás
+    if to_col == from_col:
+        return record['captured'] is not None # Captura de frente
+    return record['captured'] is None # Diagonal sin captura
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de partidas de ChessMagic para estadísticas de habilidades.")
+    parser.add_argument('--games', type=int, default=100, help="número de partidas (por defecto 100)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="procesos en paralelo (por defecto, todos los núcleos)")
+    parser.add_argument('--seed', type=int, default=0, help="semilla base; la partida i usa seed + i")
+    parser.add_argument('--max-plies', type=int, default=300, help="límite de medios movimientos por partida (por defecto 300)")
+    parser.add_argument('--policy', default='random', choices=['random', 'engine'], help="cómo eligen jugada ambos bandos")
+    parser.add_argument('--move-time', type=float, default=0.05, help="segundos por jugada con --policy engine")
+    parser.add_argument('--depth', type=int, default=3, help="profundidad máxima con --policy engine (por defecto 3)")
+    parser.add_argument('--generator', default=config.MOVE_GENERATOR, choices=['pieces', 'bitboard'], help="generador de movimientos")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="archivo JSON Lines de resultados")
+    args = parser.parse_args(argv)
+
+    settings = {
+        'seed': args.seed,
+        'max_plies': args.max_plies,
+        'policy': args.policy,
+        'move_time': args.move_time,
+        'depth': args.depth,
+        'generator': args.generator,
+    }
+    outcomes = {}
+    wins = {'white': 0, 'black': 0, None: 0}
+    total_plies = 0
+
+    start = time.perf_counter()
+    with open(args.output, 'w') as out, multiprocessing.Pool(args.workers, _init_worker, (settings,)) as pool:
+        # Lotes pequeños: los resultados se escriben en cuanto termina cada partida
+        chunksize = max(1, min(16, args.games // (args.workers * 8)))
+        for result in pool.imap_unordered(play_game, range(args.games), chunksize):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+            wins[result['winner']] += 1
+            total_plies += result['plies']
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games} partidas, {total_plies} movimientos en {elapsed:.1f}s "
+          f"({total_plies / elapsed * 3600:.0f} movimientos/hora con {args.workers} procesos)")
+    print(f"Ganan las blancas: {wins['white']}, las negras: {wins['black']}, sin ganador: {wins[None]}")
+    print("Resultados: " + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+    print(f"Partidas guardadas en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,218 @@
 # Archivo: ui.py
 # Descripción: Contiene las funciones para dibujar la interfaz de usuario del juego.
 
+import os
+from collections import OrderedDict
 import pygame as pg
 import config
+from pieces import PIECE_TYPES
+
+# Imágenes de las piezas ya escaladas, por clave "color_nombre". Se cargan la primera vez
+# que se dibujan para que el núcleo de reglas (board/pieces) no dependa de Pygame.
+_piece_images = {}
+
+# Fuentes ya creadas por (nombre, tamaño, negrita): SysFont busca la fuente en el sistema cada vez
+_fonts = {}
+# Superficies de texto ya renderizadas por (texto, fuente, color), con expulsión LRU
+_text_surfaces = OrderedDict()
+TEXT_CACHE_SIZE = 256
+# Tira de glifos de los cronómetros por color: (superficie, ancho de cada glifo, alto)
+_timer_strips = {}
+TIMER_GLYPHS = "0123456789:"
+# Líneas de texto del panel de tiempos (F3)
+PROFILER_OVERLAY_LINES = 8
+# Tableros ya pintados por par de colores (claro, oscuro) y auras por color RGBA
+_board_surfaces = {}
+_aura_surfaces = {}
+
+def get_font(name, size, bold=False):
+    """Devuelve la fuente del sistema pedida, creándola solo la primera vez."""
+    key = (name, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pg.font.SysFont(name, size, bold=bold)
+    return font
+
+def render_text(font, text, color):
+    """Superficie con 'text' renderizado; los textos repetidos salen de la caché."""
+    key = (text, font, color)
+    surface = _text_surfaces.get(key)
+    if surface is not None:
+        _text_surfaces.move_to_end(key)
+        return surface
+    surface = _text_surfaces[key] = font.render(text, True, color)
+    if len(_text_surfaces) > TEXT_CACHE_SIZE:
+        _text_surfaces.popitem(last=False) # Descarta el texto usado hace más tiempo
+    return surface
+
+def _timer_strip(color):
+    """Tira con los glifos '0'-'9' y ':' de los cronómetros, renderizada una vez por color."""
+    strip = _timer_strips.get(color)
+    if strip is None:
+        font = get_font(None, config.UI_FONT_SIZE + 6)
+        glyphs = [font.render(glyph, True, color) for glyph in TIMER_GLYPHS]
+        # Todas las cifras ocupan el mismo ancho para que el reloj no "baile" al cambiar
+        digit_width = max(glyph.get_width() for glyph in glyphs[:10])
+        widths = [digit_width] * 10 + [glyphs[10].get_width()]
+        height = max(glyph.get_height() for glyph in glyphs)
+        surface = pg.Surface((sum(widths), height), pg.SRCALPHA)
+        surface.fill((*color[:3], 0)) # Transparente pero del mismo color: bordes sin oscurecer
+        offsets = []
+        x = 0
+        for glyph, width in zip(glyphs, widths):
+            surface.blit(glyph, (x + (width - glyph.get_width()) // 2, 0))
+            offsets.append(x)
+            x += width
+        strip = _timer_strips[color] = (surface, [pg.Rect(x, 0, w, height) for x, w in zip(offsets, widths)], height)
+    return strip
+
+def draw_timer(screen, seconds, midleft, color=config.UI_FONT_COLOR):
+    """Dibuja un cronómetro MM:SS copiando cada glifo de la tira precalculada."""
+    minutes, seconds = divmod(int(seconds), 60)
+    surface, areas, height = _timer_strip(color)
+    x = midleft[0]
+    y = midleft[1] - height // 2
+    for glyph in f"{minutes:02}:{seconds:02}":
+        area = areas[TIMER_GLYPHS.index(glyph)]
+        screen.blit(surface, (x, y), area)
+        x += area.width
+
+def get_board_surface(colors):
+    """Tablero ya pintado para un par de colores; se genera una vez por cada par usado."""
+    key = (colors["light"], colors["dark"])
+    surface = _board_surfaces.get(key)
+    if surface is None:
+        surface = pg.Surface((config.BOARD_WIDTH, config.BOARD_HEIGHT))
+        for row in range(config.ROWS):
+            for col in range(config.COLS):
+                # Alternar colores para crear el patrón de tablero
+                color = colors["light"] if (row + col) % 2 == 0 else colors["dark"]
+                pg.draw.rect(surface, color, (col * config.SQUARE_SIZE, row * config.SQUARE_SIZE, config.SQUARE_SIZE, config.SQUARE_SIZE))
+        _board_surfaces[key] = surface
+    return surface
+
+def get_aura_surface(color):
+    """Círculo semitransparente del tamaño de una casilla, creado una vez por color."""
+    surface = _aura_surfaces.get(color)
+    if surface is None:
+        surface = pg.Surface((config.SQUARE_SIZE, config.SQUARE_SIZE), pg.SRCALPHA)
+        pg.draw.circle(surface, color, (config.SQUARE_SIZE // 2, config.SQUARE_SIZE // 2), config.SQUARE_SIZE // 2)
+        _aura_surfaces[color] = surface
+    return surface
 
 def draw_board(screen, colors):
     """Dibuja el tablero de ajedrez en la pantalla."""
+    screen.blit(get_board_surface(colors), (0, config.TOP_UI_HEIGHT))
+
+def square_topleft(row, col):
+    """Posición en píxeles de la esquina superior izquierda de una casilla."""
+    return (col * config.SQUARE_SIZE, row * config.SQUARE_SIZE + config.TOP_UI_HEIGHT)
+
+def get_piece_image(color, name):
+    """Devuelve la imagen de una pieza, cargándola del disco solo la primera vez."""
+    image_key = f"{color}_{name}"
+    if image_key not in _piece_images:
+        image_path = os.path.join(config.ASSETS_PATH, f"{image_key}.png")
+        original_image = pg.image.load(image_path)
+        _piece_images[image_key] = pg.transform.scale(original_image, (config.SQUARE_SIZE, config.SQUARE_SIZE))
+    return _piece_images[image_key]
+
+def preload_piece_images():
+    """Carga de antemano las imágenes de todas las piezas (tras mostrar el menú)."""
+    for color in ('white', 'black'):
+        for name in PIECE_TYPES[1:]:
+            get_piece_image(color, name)
+
+def draw_pieces(screen, board):
+    """Dibuja todas las piezas del tablero, con un aura si tienen una habilidad."""
     for row in range(config.ROWS):
         for col in range(config.COLS):
-            # Alternar colores para crear el patrón de tablero
-            if (row + col) % 2 == 0:
-                color = colors["light"]
-            else:
-                color = colors["dark"]
-            pg.draw.rect(screen, color, (col * config.SQUARE_SIZE, row * config.SQUARE_SIZE + config.TOP_UI_HEIGHT, config.SQUARE_SIZE, config.SQUARE_SIZE))
+            piece = board.board[row][col]
+            if piece is not None:
+                draw_piece(screen, piece, square_topleft(row, col))
+
+def draw_piece(screen, piece, topleft):
+    """Dibuja una pieza en la posición dada, con el aura de su habilidad si la tiene."""
+    if piece.ability:
+        # Obtiene el color de la habilidad o usa el color por defecto si no se encuentra
+        aura_color = config.ABILITY_COLORS.get(piece.ability, config.ABILITY_COLORS['default'])
+        screen.blit(get_aura_surface(aura_color), topleft)
+    screen.blit(get_piece_image(piece.color, piece.name), topleft)
+
+def draw_check_aura(screen, row, col):
+    """Dibuja el aura roja de jaque sobre la casilla del rey."""
+    screen.blit(get_aura_surface(config.CHECK_AURA_COLOR), square_topleft(row, col))
+
+def draw_square(screen, board, row, col, colors, in_check=False):
+    """Redibuja una sola casilla: su color, el aura de jaque si corresponde y la pieza que la ocupa."""
+    topleft = square_topleft(row, col)
+    area = (col * config.SQUARE_SIZE, row * config.SQUARE_SIZE, config.SQUARE_SIZE, config.SQUARE_SIZE)
+    screen.blit(get_board_surface(colors), topleft, area)
+    if in_check:
+        draw_check_aura(screen, row, col)
+    piece = board.board[row][col]
+    if piece is not None:
+        draw_piece(screen, piece, topleft)
+
+def board_rect():
+    """Rectángulo que ocupa el tablero en la pantalla."""
+    return pg.Rect(0, config.TOP_UI_HEIGHT, config.BOARD_WIDTH, config.BOARD_HEIGHT)
+
+def top_bar_rect():
+    """Rectángulo de la barra superior."""
+    return pg.Rect(0, 0, config.WIDTH, config.TOP_UI_HEIGHT)
+
+def bottom_bar_rect():
+    """Rectángulo de la barra inferior."""
+    return pg.Rect(0, config.TOP_UI_HEIGHT + config.BOARD_HEIGHT, config.WIDTH, config.BOTTOM_UI_HEIGHT)
+
+def black_timer_pos():
+    """Punto medio izquierdo del cronómetro de las negras (barra superior)."""
+    return (20, config.TOP_UI_HEIGHT / 2)
+
+def white_timer_pos(swatch_rects):
+    """Punto medio izquierdo del cronómetro de las blancas, bajo la paleta de colores."""
+    return (swatch_rects[0].left, config.TOP_UI_HEIGHT + config.BOARD_HEIGHT + config.BOTTOM_UI_HEIGHT * 0.75)
+
+def timer_rect(midleft):
+    """Región que ocupa un cronómetro dibujado en 'midleft', sea cual sea su valor."""
+    _, areas, height = _timer_strip(config.UI_FONT_COLOR)
+    width = 4 * areas[0].width + areas[-1].width
+    return pg.Rect(midleft[0], midleft[1] - height // 2, width, height)
+
+def draw_profiler_overlay(screen, lines):
+    """Panel de tiempos (tecla F3) en la esquina superior derecha del tablero. Devuelve su rectángulo."""
+    font = get_font(None, 18)
+    line_height = font.get_linesize()
+    # Tamaño fijo: al redibujarlo tapa por completo el contenido anterior
+    rect = pg.Rect(0, 0, 260, PROFILER_OVERLAY_LINES * line_height + 8)
+    rect.topright = (config.WIDTH - 5, config.TOP_UI_HEIGHT + 5)
+    pg.draw.rect(screen, config.BLACK, rect)
+    for i, line in enumerate(lines[:PROFILER_OVERLAY_LINES]):
+        # Sin caché de texto: las cifras cambian en cada fotograma
+        screen.blit(font.render(line, True, (57, 255, 20)), (rect.x + 6, rect.y + 4 + i * line_height))
+    return rect
+
+class DirtyRegions:
+    """
+    Recuerda qué se dibujó en cada región de la pantalla de juego (una "firma" por región)
+    para que render_game solo redibuje, y envíe a la pantalla, las regiones que cambiaron.
+    """
+    def __init__(self):
+        self.signatures = {}
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Obliga a redibujar la pantalla completa en el siguiente fotograma."""
+        self.signatures.clear()
+        self.full_redraw = True
+
+    def changed(self, name, signature):
+        """Guarda la firma de la región 'name' e indica si es distinta de la anterior."""
+        if self.signatures.get(name, self) == signature:
+            return False
+        self.signatures[name] = signature
+        return True
 
 def create_palette_rects():
     """Calcula y devuelve los rectángulos para la paleta de colores. Se llama una sola vez."""
@@ -40,9 +239,9 @@ def create_palette_rects():
 
 def draw_change_color_button(screen):
     """Dibuja el botón 'Cambiar Color' y devuelve su rectángulo."""
-    font = pg.font.SysFont(None, config.UI_FONT_SIZE)
+    font = get_font(None, config.UI_FONT_SIZE)
     text = "Cambiar Color"
-    text_surface = font.render(text, True, config.BLACK)
+    text_surface = render_text(font, text, config.BLACK)
     
     button_width = text_surface.get_width() + 20
     button_height = text_surface.get_height() + 20
@@ -58,42 +257,39 @@ def draw_change_color_button(screen):
     
     return button_rect
 
-def draw_top_bar(screen, game_logic, game_mode, black_time):
-    """Dibuja la barra superior con información del estado del juego."""
+def draw_top_bar(screen, game_logic, game_mode, black_time, status=None):
+    """Dibuja la barra superior con información del estado del juego y, a la derecha, un aviso breve (p. ej. 'Partida guardada')."""
     # Fondo de la barra superior
-    pg.draw.rect(screen, config.UI_BG, (0, 0, config.WIDTH, config.TOP_UI_HEIGHT))
+    pg.draw.rect(screen, config.UI_BG, top_bar_rect())
     # Texto del turno
-    font = pg.font.SysFont(None, config.UI_FONT_SIZE + 4)
+    font = get_font(None, config.UI_FONT_SIZE + 4)
     turn_text = f"Turno: {game_logic.turn.capitalize()}"
-    turn_surface = font.render(turn_text, True, config.UI_FONT_COLOR)
+    turn_surface = render_text(font, turn_text, config.UI_FONT_COLOR)
     turn_rect = turn_surface.get_rect(center=(config.WIDTH / 2, config.TOP_UI_HEIGHT / 3))
     screen.blit(turn_surface, turn_rect)
 
     # Texto de la habilidad activa
     if game_logic.piece_with_ability and game_logic.piece_with_ability.ability:
         ability_text = f"Habilidad Activa: {game_logic.piece_with_ability.ability.replace('_', ' ').title()} ({game_logic.piece_with_ability.name.title()})"
-        ability_font = pg.font.SysFont(None, config.UI_FONT_SIZE - 4) # Un poco más pequeño
-        ability_surface = ability_font.render(ability_text, True, config.ABILITY_FONT_COLOR)
+        ability_font = get_font(None, config.UI_FONT_SIZE - 4) # Un poco más pequeño
+        ability_surface = render_text(ability_font, ability_text, config.ABILITY_FONT_COLOR)
         ability_rect = ability_surface.get_rect(center=(config.WIDTH / 2, config.TOP_UI_HEIGHT * 2 / 3))
         screen.blit(ability_surface, ability_rect)
 
     # Mostrar cronómetro de las negras en la parte superior si el modo es 'timed'
     if game_mode == 'timed':
-        timer_font = pg.font.SysFont(None, config.UI_FONT_SIZE + 6)
-        
-        # Cronómetro Negro
-        black_minutes, black_seconds = divmod(int(black_time), 60)
-        black_text = f"{black_minutes:02}:{black_seconds:02}"
-        black_surface = timer_font.render(black_text, True, config.UI_FONT_COLOR)
-        black_rect = black_surface.get_rect(midleft=(20, config.TOP_UI_HEIGHT / 2))
-        screen.blit(black_surface, black_rect)
+        draw_timer(screen, black_time, black_timer_pos()) # Cronómetro Negro
+
+    if status:
+        status_surface = render_text(get_font(None, config.UI_FONT_SIZE - 4), status, config.UI_FONT_COLOR)
+        screen.blit(status_surface, status_surface.get_rect(midright=(config.WIDTH - 20, config.TOP_UI_HEIGHT / 2)))
 
 def draw_bottom_ui(screen, selected_color, swatch_rects, game_mode, white_time):
     """Dibuja toda la UI inferior, incluyendo paleta, botones y cronómetro."""
     buttons = {}
     
     # Fondo de la UI
-    pg.draw.rect(screen, config.UI_BG, (0, config.TOP_UI_HEIGHT + config.BOARD_HEIGHT, config.WIDTH, config.BOTTOM_UI_HEIGHT))
+    pg.draw.rect(screen, config.UI_BG, bottom_bar_rect())
 
     # --- Paleta de Colores (Izquierda) ---
     for i, rect in enumerate(swatch_rects):
@@ -111,23 +307,15 @@ def draw_bottom_ui(screen, selected_color, swatch_rects, game_mode, white_time):
 
     # --- Cronómetro de las blancas (si está en modo 'timed') ---
     if game_mode == 'timed':
-        timer_font = pg.font.SysFont(None, config.UI_FONT_SIZE + 6)
-        white_minutes, white_seconds = divmod(int(white_time), 60)
-        white_text = f"{white_minutes:02}:{white_seconds:02}"
-        white_surface = timer_font.render(white_text, True, config.UI_FONT_COLOR)
-
         # Posicionar el cronómetro debajo de la paleta de colores, a la izquierda.
-        # Usamos el primer swatch de la paleta como referencia para la posición X.
-        palette_start_x = swatch_rects[0].left
-        white_rect = white_surface.get_rect(midleft=(palette_start_x, config.TOP_UI_HEIGHT + config.BOARD_HEIGHT + config.BOTTOM_UI_HEIGHT * 0.75))
-        screen.blit(white_surface, white_rect)
+        draw_timer(screen, white_time, white_timer_pos(swatch_rects))
 
     return buttons
 
 def draw_action_icons(screen):
     """Dibuja los botones de acción como iconos en una cuadrícula 3x2 en la esquina inferior derecha."""
     buttons = {}
-    icon_font = pg.font.SysFont('Arial', config.ICON_SIZE // 2, bold=True)
+    icon_font = get_font('Arial', config.ICON_SIZE // 2, bold=True)
     
     # Definimos los iconos (texto) y sus claves
     icons = [('guardar', 'S'), ('cargar', 'L'), ('reiniciar', 'R'), ('menú', 'M'), ('info', '?')]
@@ -145,7 +333,7 @@ def draw_action_icons(screen):
         rect = pg.Rect(x, y, config.ICON_SIZE, config.ICON_SIZE)
         pg.draw.rect(screen, config.UI_FONT_COLOR, rect, border_radius=5)
         
-        text_surface = icon_font.render(symbol, True, config.BLACK)
+        text_surface = render_text(icon_font, symbol, config.BLACK)
         text_rect = text_surface.get_rect(center=rect.center)
         screen.blit(text_surface, text_rect)
         buttons[key] = rect
@@ -155,7 +343,7 @@ def draw_action_icons(screen):
 def draw_bottom_right_buttons(screen):
     """Dibuja el botón 'Cambiar Color' y los botones de acción en la esquina inferior derecha."""
     buttons = {}
-    font = pg.font.SysFont(None, config.UI_FONT_SIZE - 4)
+    font = get_font(None, config.UI_FONT_SIZE - 4)
     
     # --- Botones de Acción ---
     action_texts = ["Guardar", "Cargar", "Reiniciar", "Menú", "Info"]
@@ -173,7 +361,7 @@ def draw_bottom_right_buttons(screen):
         rect = pg.Rect(button_x, button_y, button_width, button_height)
         
         pg.draw.rect(screen, config.UI_FONT_COLOR, rect, border_radius=5)
-        text_surface = font.render(text, True, config.BLACK)
+        text_surface = render_text(font, text, config.BLACK)
         text_rect = text_surface.get_rect(center=rect.center)
         screen.blit(text_surface, text_rect)
         
@@ -183,8 +371,8 @@ def draw_bottom_right_buttons(screen):
     # --- Botón Cambiar Color ---
     # Lo posicionamos a la izquierda de los botones de acción
     change_color_text = "Cambiar Color"
-    change_color_font = pg.font.SysFont(None, config.UI_FONT_SIZE - 2)
-    change_color_surface = change_color_font.render(change_color_text, True, config.BLACK)
+    change_color_font = get_font(None, config.UI_FONT_SIZE - 2)
+    change_color_surface = render_text(change_color_font, change_color_text, config.BLACK)
     
     cc_button_width = change_color_surface.get_width() + 15
     cc_button_height = change_color_surface.get_height() + 15
@@ -203,16 +391,17 @@ def draw_menu(screen, title_color):
     buttons = {}
     
     # Título
-    title_font = pg.font.SysFont(None, 74)
-    title_surface = title_font.render("ChessMagic", True, title_color)
+    title_font = get_font(None, 74)
+    title_surface = render_text(title_font, "ChessMagic", title_color)
     title_rect = title_surface.get_rect(center=(config.WIDTH / 2, config.HEIGHT / 4))
     screen.blit(title_surface, title_rect)
 
     # Botones
-    button_font = pg.font.SysFont(None, 40) # Tamaño de fuente reducido para que encaje
+    button_font = get_font(None, 40) # Tamaño de fuente reducido para que encaje
     button_options = {
         'indefinite': "Modo Clásico (Sin Tiempo)",
-        'timed': "Modo Cronómetro (10 min)"
+        'timed': "Modo Cronómetro (10 min)",
+        'computer': "Contra la Computadora (10 min)"
     }
     
     button_height = 60
@@ -223,7 +412,7 @@ def draw_menu(screen, title_color):
         rect = pg.Rect((config.WIDTH - button_width) / 2, y_pos, button_width, button_height)
         buttons[key] = rect
         pg.draw.rect(screen, config.DEFAULT_DARK_SQUARE, rect, border_radius=10)
-        text_surface = button_font.render(text, True, (0, 255, 255)) # Cian Neón para mejor contraste
+        text_surface = render_text(button_font, text, (0, 255, 255)) # Cian Neón para mejor contraste
         text_rect = text_surface.get_rect(center=rect.center)
         screen.blit(text_surface, text_rect)
         
@@ -246,20 +435,20 @@ def draw_info_popup(screen):
     pg.draw.rect(screen, config.WHITE, panel_rect, 2, border_radius=15)
 
     # Título
-    title_font = pg.font.SysFont(None, 40)
-    title_surface = title_font.render("Habilidades Disponibles", True, config.ABILITY_FONT_COLOR)
+    title_font = get_font(None, 40)
+    title_surface = render_text(title_font, "Habilidades Disponibles", config.ABILITY_FONT_COLOR)
     title_rect = title_surface.get_rect(center=(config.WIDTH / 2, panel_y + 40))
     screen.blit(title_surface, title_rect)
 
     # --- Lógica de ajuste de texto para las descripciones ---
-    desc_font = pg.font.SysFont(None, 24)
+    desc_font = get_font(None, 24)
     current_y = panel_y + 90 # Posición Y inicial para el contenido
     max_width = panel_width - 60 # Ancho máximo para el texto (panel - márgenes)
 
     for ability, desc in config.ABILITY_DESCRIPTIONS.items():
         # Nombre de la habilidad
         ability_name = ability.replace('_', ' ').title()
-        name_surface = desc_font.render(f"• {ability_name}:", True, config.WHITE)
+        name_surface = render_text(desc_font, f"• {ability_name}:", config.WHITE)
         screen.blit(name_surface, (panel_x + 30, current_y))
         current_y += 25 # Mover hacia abajo para la descripción
 
@@ -272,17 +461,17 @@ def draw_info_popup(screen):
                 line = test_line
             else:
                 # Dibujar la línea actual y empezar una nueva
-                line_surface = desc_font.render(line, True, config.UI_FONT_COLOR)
+                line_surface = render_text(desc_font, line, config.UI_FONT_COLOR)
                 screen.blit(line_surface, (panel_x + 40, current_y))
                 current_y += 20 # Espacio entre líneas
                 line = word + " "
         # Dibujar la última línea restante
-        line_surface = desc_font.render(line, True, config.UI_FONT_COLOR)
+        line_surface = render_text(desc_font, line, config.UI_FONT_COLOR)
         screen.blit(line_surface, (panel_x + 40, current_y))
         current_y += 40 # Espacio antes de la siguiente habilidad
 
     # Mensaje para cerrar
-    close_font = pg.font.SysFont(None, 20)
-    close_surface = close_font.render("Haz clic fuera para cerrar", True, config.UI_FONT_COLOR)
+    close_font = get_font(None, 20)
+    close_surface = render_text(close_font, "Haz clic fuera para cerrar", config.UI_FONT_COLOR)
     close_rect = close_surface.get_rect(center=(config.WIDTH / 2, panel_y + panel_height - 20))
     screen.blit(close_surface, close_rect)
\ No newline at end of file
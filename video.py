@@ -0,0 +1,93 @@
+# Archivo: video.py
+# Descripción: Reproductor del vídeo de fondo del menú. Un hilo decodifica los fotogramas
+# (imágenes sueltas) en orden, escala cada uno una sola vez al tamaño de la ventana y los deja
+# en un búfer acotado; el hilo principal elige qué fotograma mostrar según el reloj real, a la
+# velocidad del clip original, sin importar cuántas veces por segundo se dibuje el menú.
+import os
+import queue
+import threading
+import time
+
+import pygame
+
+FRAME_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Si el menú no pide fotogramas durante más de este tiempo (se está jugando), el vídeo
+# se considera en pausa y al volver sigue desde el fotograma en el que se quedó.
+PAUSE_GAP = 0.25
+
+
+class VideoPlayer:
+    """
+    Vídeo en bucle a partir de una carpeta de fotogramas. La memoria está acotada: como
+    mucho hay 'buffer_size' fotogramas decodificados en espera más el que se está mostrando.
+    """
+    def __init__(self, frames_path, size, fps, buffer_size):
+        # Obtener lista de archivos y ordenarla alfabéticamente para asegurar el orden correcto
+        self.frame_files = [os.path.join(frames_path, name) for name in sorted(os.listdir(frames_path))
+                            if name.endswith(FRAME_EXTENSIONS)]
+        self.size = size
+        self.frame_time = 1.0 / fps
+        self._frames = queue.Queue(maxsize=buffer_size) # Búfer circular productor/consumidor
+        self._stop = threading.Event()
+        self._thread = None
+        self._current = None # Fotograma en pantalla
+        self._next_index = 0 # Índice (creciente entre vueltas) del siguiente fotograma a mostrar
+        self._clock_start = 0.0 # Instante en que se habría mostrado el fotograma 0
+        self._last_request = 0.0
+
+    def start(self):
+        """Lanza el hilo decodificador. No espera a que haya ningún fotograma listo."""
+        if self.frame_files and self._thread is None:
+            self._thread = threading.Thread(target=self._decode, name="menu-video", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo decodificador (se llama antes de pygame.quit)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def current_frame(self):
+        """
+        Fotograma que corresponde mostrar ahora, o None si aún no hay ninguno decodificado.
+        Si el decodificador se retrasa, se repite el último fotograma; si el menú se dibuja
+        más despacio que el clip, se saltan los fotogramas que ya pasaron.
+        """
+        now = time.perf_counter()
+        if self._current is None or now - self._last_request > PAUSE_GAP:
+            # Primer fotograma o vuelta al menú: el reloj del vídeo arranca (o sigue) desde aquí
+            self._clock_start = now - self._next_index * self.frame_time
+        self._last_request = now
+
+        target = int((now - self._clock_start) / self.frame_time)
+        while self._next_index <= target:
+            try:
+                index, frame = self._frames.get_nowait()
+            except queue.Empty:
+                break
+            self._current = frame
+            self._next_index = index + 1
+        return self._current
+
+    def _decode(self):
+        """Cuerpo del hilo: decodifica y escala los fotogramas en bucle mientras haya hueco."""
+        index = 0
+        count = len(self.frame_files)
+        while not self._stop.is_set():
+            path = self.frame_files[index % count]
+            try:
+                frame = pygame.transform.scale(pygame.image.load(path), self.size)
+                if pygame.display.get_surface() is not None:
+                    frame = frame.convert() # Mismo formato que la pantalla: el blit es directo
+            except pygame.error as e:
+                print(f"Advertencia: No se pudo cargar el fotograma de vídeo {path}: {e}")
+                return
+            # Espera a que el menú consuma fotogramas; así la memoria no crece
+            while not self._stop.is_set():
+                try:
+                    self._frames.put((index, frame), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            index += 1
@@ -0,0 +1,67 @@
+# Archivo: zobrist.py
+# Descripción: Claves aleatorias de 64 bits para el hashing Zobrist de posiciones.
+# El hash de una posición es el XOR de las claves de todo lo que la describe, por lo que
+# se puede actualizar de forma incremental al mover una pieza.
+import random
+
+from bitboard import COLORS, PIECE_NAMES
+from pieces import TYPE_MASK, BLACK_FLAG, MOVED_FLAG, ABILITY_MASK, PIECE_TYPES, ABILITIES_BY_CODE
+
+# Semilla fija: el mismo tablero produce el mismo hash en todas las ejecuciones,
+# lo que permite guardar hashes en la base de datos.
+_rng = random.Random(20250101)
+
+
+def _keys():
+    return [_rng.getrandbits(64) for _ in range(64)]
+
+
+# Pieza de un color y tipo en cada casilla
+PIECE_KEYS = {color: {name: _keys() for name in PIECE_NAMES} for color in COLORS}
+# La pieza de esa casilla ya se ha movido (afecta al doble paso de los peones)
+HAS_MOVED_KEYS = _keys()
+# La pieza de esa casilla tiene una habilidad activa
+ABILITY_KEYS = {
+    'omni_directional_pawn': _keys(),
+    'double_step_rook': _keys(),
+}
+# Es el turno de las negras
+BLACK_TO_MOVE = _rng.getrandbits(64)
+# La torre de esa casilla ya hizo el primer paso de su doble movimiento
+DOUBLE_STEP_KEYS = _keys()
+
+
+def _code_key(code, sq):
+    """Clave combinada (tipo, color, has_moved y habilidad) del byte 'code' en la casilla sq."""
+    piece_type = code & TYPE_MASK
+    if not 0 < piece_type < len(PIECE_TYPES):
+        return 0 # Casilla vacía (o código sin pieza)
+    color = 'black' if code & BLACK_FLAG else 'white'
+    key = PIECE_KEYS[color][PIECE_TYPES[piece_type]][sq]
+    if code & MOVED_FLAG:
+        key ^= HAS_MOVED_KEYS[sq]
+    ability = ABILITIES_BY_CODE.get(code & ABILITY_MASK)
+    if ability:
+        key ^= ABILITY_KEYS[ability][sq]
+    return key
+
+
+# Tabla precalculada casilla x byte de Board.squares: el hash se actualiza con tres XOR por movimiento
+CODE_KEYS = [[_code_key(code, sq) for code in range(128)] for sq in range(64)]
+
+
+def hash_position(squares, turn, double_step_square=None):
+    """
+    Hash completo de una posición a partir de sus 64 bytes, el turno y la casilla de la torre
+    a mitad de su doble paso. Da lo mismo que GameLogic.position_hash() sin necesitar un
+    tablero (sirve, por ejemplo, para indexar posiciones guardadas).
+    """
+    position_hash = 0
+    for sq, code in enumerate(squares):
+        if code:
+            position_hash ^= CODE_KEYS[sq][code]
+    if turn == 'black':
+        position_hash ^= BLACK_TO_MOVE
+    if double_step_square is not None:
+        position_hash ^= DOUBLE_STEP_KEYS[double_step_square]
+    return position_hash